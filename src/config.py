@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 
 @dataclass
@@ -14,25 +15,36 @@ class Config:
     fetch_page_body: bool = True
     body_max_chars: int = 4000
     tagged_at_property_name: str = "最終タグ付け日時"
+    batch_size: int = 10
 
     def __post_init__(self):
-        self.notion_api_key = os.getenv("NOTION_API_KEY", self.notion_api_key)
-        self.notion_database_id = os.getenv("NOTION_DATABASE_ID", self.notion_database_id)
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY", self.gemini_api_key)
-        self.claude_api_key = os.getenv("CLAUDE_API_KEY", self.claude_api_key)
-        self.llm_provider = os.getenv("LLM_PROVIDER", self.llm_provider)
-        tag_env = os.getenv("TAG_PROPERTY_NAME", "")
+        env = os.environ
+        self.notion_api_key = env.get("NOTION_API_KEY", self.notion_api_key)
+        self.notion_database_id = env.get("NOTION_DATABASE_ID", self.notion_database_id)
+        self.gemini_api_key = env.get("GEMINI_API_KEY", self.gemini_api_key)
+        self.claude_api_key = env.get("CLAUDE_API_KEY", self.claude_api_key)
+        self.llm_provider = env.get("LLM_PROVIDER", self.llm_provider)
+        tag_env = env.get("TAG_PROPERTY_NAME", "")
         if tag_env:
             self.tag_property_name = tag_env
         if not self.content_properties:
-            content_env = os.getenv("CONTENT_PROPERTIES", "")
+            content_env = env.get("CONTENT_PROPERTIES", "")
             self.content_properties = content_env.split(",") if content_env else ["タイトル"]
-        fetch_env = os.getenv("FETCH_PAGE_BODY", "").lower()
+        fetch_env = env.get("FETCH_PAGE_BODY", "").lower()
         if fetch_env in ("false", "0", "no"):
             self.fetch_page_body = False
-        body_env = os.getenv("BODY_MAX_CHARS", "")
+        body_env = env.get("BODY_MAX_CHARS", "")
         if body_env:
             self.body_max_chars = int(body_env)
-        tagged_at_env = os.getenv("TAGGED_AT_PROPERTY_NAME", "")
+        tagged_at_env = env.get("TAGGED_AT_PROPERTY_NAME", "")
         if tagged_at_env:
             self.tagged_at_property_name = tagged_at_env
+        batch_env = env.get("BATCH_SIZE", "")
+        if batch_env:
+            self.batch_size = int(batch_env)
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """環境変数から生成したConfigを返す（プロセス内で1度だけ解析）"""
+    return Config()
@@ -1,22 +1,47 @@
 """Notion Knowledge DB 自動タグ付けシステム エントリーポイント"""
 
 import argparse
+import asyncio
+import dataclasses
 import logging
 import sys
 import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
 
-from config import Config
+from config import Config, get_config
 from notion_service import NotionDB
+from rate_limiter import AsyncRateLimiter
 from tagger import RateLimitError, create_tagger
 from utils import extract_body_content, extract_content
 
 # LLMプロバイダごとのリクエスト間隔（秒）
-LLM_SLEEP_INTERVALS = {
-    "gemini": 0.5,
-    "claude": 0.5,
+# Gemini無料枠は 15 RPM のため 60 / 15 = 4秒間隔にする
+# Claude は Tier 1 の 50 RPM に合わせて 60 / 50 = 1.2秒間隔にする
+LLM_REQUEST_INTERVALS = {
+    "gemini": 60 / 15,
+    "claude": 60 / 50,
 }
 
+# Notion API のリクエスト間隔（秒）。レート制限 3 req/s に合わせる
+NOTION_REQUEST_INTERVAL = 0.35
+
+# 同時に処理するバッチ数の上限
+MAX_CONCURRENCY = 4
+
+# タグ付け待ちのバッチについて先行して本文を取得しておくバッチ数
+PREFETCH_BATCHES = 2
+
+# Notion API 呼び出し用のワーカースレッド数（3 req/s に合わせる）
+NOTION_MAX_WORKERS = 3
+
+# タグ更新キューの上限と、キューを消化する書き込みタスク数
+UPDATE_QUEUE_SIZE = 20
+UPDATE_WRITERS = 3
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -24,24 +49,41 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def _infer_with_retry(tagger, content: dict, page_id: str) -> list:
-    """タグ推論を1回リトライ付きで実行。429はそのまま送出。"""
+class _AbortableLimiter:
+    """abort後は待機明けにRateLimitErrorを送出し、以降のLLM呼び出しを止めるリミッター"""
+
+    def __init__(self, limiter: AsyncRateLimiter, aborted: asyncio.Event):
+        self.limiter = limiter
+        self.aborted = aborted
+
+    async def acquire(self):
+        await self.limiter.acquire()
+        if self.aborted.is_set():
+            raise RateLimitError("aborted by another batch")
+
+
+async def _infer_with_retry(tagger, content: dict, page_id: str, limiter) -> list:
+    """タグ推論を1回リトライ付きで実行。429はそのまま送出。
+
+    リトライも含め、LLMを呼ぶ直前にレートリミッターで間隔を調整する
+    （既存タグとの一致やキャッシュで決まる場合は待機しない）。
+    """
     try:
-        return tagger.infer_tags(content)
+        return await tagger.tag_async(content, limiter=limiter)
     except RateLimitError:
         raise
     except Exception as first_err:
-        logger.warning(f"Retry for {page_id} due to: {first_err}")
+        logger.warning("Retry for %s due to: %s", page_id, first_err)
         try:
-            return tagger.infer_tags(content)
+            return await tagger.tag_async(content, limiter=limiter)
         except RateLimitError:
             raise
         except Exception as retry_err:
             raise retry_err from first_err
 
 
-def _should_skip(page: dict, tagged_at_property: str, hours: int) -> bool:
-    """最終タグ付け日時がN時間以内ならスキップする。"""
+def _should_skip(page: dict, tagged_at_property: str, cutoff_ts: float) -> bool:
+    """最終タグ付け日時が cutoff_ts（UNIX時刻）より後ならスキップする。"""
     props = page.get("properties", {})
     tagged_at_value = props.get(tagged_at_property, {}).get("date")
     if not tagged_at_value or not tagged_at_value.get("start"):
@@ -49,72 +91,229 @@ def _should_skip(page: dict, tagged_at_property: str, hours: int) -> bool:
 
     try:
         tagged_at = datetime.fromisoformat(tagged_at_value["start"])
-        if tagged_at.tzinfo is None:
-            tagged_at = tagged_at.replace(tzinfo=timezone.utc)
-        diff_hours = (datetime.now(timezone.utc) - tagged_at).total_seconds() / 3600
-        return diff_hours < hours
     except (ValueError, TypeError):
         return False
+    if tagged_at.tzinfo is None:
+        tagged_at = tagged_at.replace(tzinfo=timezone.utc)
+    return tagged_at.timestamp() > cutoff_ts
 
 
 def process_records(
-    records: list, notion: NotionDB, tagger, config: Config, hours: int = 24
+    records: Iterable[dict],
+    notion: NotionDB,
+    tagger,
+    config: Config,
+    hours: int = 24,
+    check_tagged_at: bool = True,
 ) -> tuple:
-    """レコードを処理してタグ付け"""
-    success = 0
-    failed = 0
-    skipped = 0
-    sleep_interval = LLM_SLEEP_INTERVALS.get(config.llm_provider, 4.0)
+    """レコードを並行処理してタグ付け
+
+    records はイテレータでもよく、先頭から逐次読み出しながら処理する。
+
+    check_tagged_at=False の場合、最終タグ付け日時によるスキップ判定を行わない
+    （差分実行ではAPIのフィルタで除外済みのため）。
+    """
+    return asyncio.run(
+        _process_records_async(records, notion, tagger, config, hours, check_tagged_at)
+    )
+
+
+async def _process_records_async(
+    records: Iterable[dict],
+    notion: NotionDB,
+    tagger,
+    config: Config,
+    hours: int,
+    check_tagged_at: bool,
+) -> tuple:
+    notion_limiter = AsyncRateLimiter(NOTION_REQUEST_INTERVAL)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    prefetch_window = asyncio.Semaphore(MAX_CONCURRENCY + PREFETCH_BATCHES)
+    # タグ更新は推論の完了を待たずにキュー経由で書き込む
+    update_queue = asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE)
+    aborted = asyncio.Event()
+    llm_limiter = _AbortableLimiter(
+        AsyncRateLimiter(LLM_REQUEST_INTERVALS.get(config.llm_provider, 4.0)), aborted
+    )
+    counts = {"success": 0, "failed": 0, "skipped": 0}
+    # スキップ判定の基準時刻はレコードごとではなく1度だけ計算する
+    check_tagged_at = check_tagged_at and bool(config.tagged_at_property_name)
+    batch_size = max(1, config.batch_size)
+    cutoff_ts = time.time() - hours * 3600
+    loop = asyncio.get_running_loop()
+    # Notion API呼び出しはLLM呼び出しとは別のスレッドプールで実行する
+    notion_executor = ThreadPoolExecutor(max_workers=NOTION_MAX_WORKERS)
+
+    async def call_notion(func, *args, **kwargs):
+        """1回のAPIリクエストで終わる呼び出しを、間隔を調整してから実行する"""
+        await notion_limiter.acquire()
+        return await loop.run_in_executor(notion_executor, partial(func, *args, **kwargs))
+
+    async def read_notion(func):
+        """ページネーションを読み進める呼び出しを実行する
+
+        間隔の調整は実際にAPIリクエストを送るときだけ NotionDB.throttle で行う。
+        """
+        return await loop.run_in_executor(notion_executor, func)
+
+    def throttle_notion():
+        # ワーカースレッドからイベントループ上のリミッターを待つ
+        asyncio.run_coroutine_threadsafe(notion_limiter.acquire(), loop).result()
+
+    def abort(i: int, err: Exception):
+        if not aborted.is_set():
+            aborted.set()
+            logger.error("Rate limit hit at record %d: %s", i + 1, err)
+            logger.error("Aborting to avoid further rate limit errors.")
 
-    for i, page in enumerate(records):
+    async def write_updates():
+        while True:
+            i, page_id, tags = await update_queue.get()
+            try:
+                await call_notion(
+                    notion.update_tags,
+                    page_id,
+                    config.tag_property_name,
+                    tags,
+                    tagged_at_property=config.tagged_at_property_name,
+                )
+                logger.info("[%d] Tagged: %s -> %s", i + 1, page_id, tags)
+                counts["success"] += 1
+            except Exception as e:
+                logger.error("Failed to tag %s: %s", page_id, e)
+                counts["failed"] += 1
+            finally:
+                update_queue.task_done()
+
+    async def prepare(i: int, page: dict):
+        """タグ推論に渡すcontentを組み立てる。処理対象外ならNoneを返す。"""
         page_id = page["id"]
 
         # 重複実行防止: 最終タグ付け日時がN時間以内ならスキップ
-        if _should_skip(page, config.tagged_at_property_name, hours):
-            logger.info(f"[{i+1}/{len(records)}] Skipped (already tagged): {page_id}")
-            skipped += 1
-            continue
+        if check_tagged_at and _should_skip(page, config.tagged_at_property_name, cutoff_ts):
+            logger.info("[%d] Skipped (already tagged): %s", i + 1, page_id)
+            return None
 
         content = extract_content(page, config.content_properties)
 
         # ページ本文（ブロック）を取得してcontentにマージ
         if config.fetch_page_body:
             try:
-                blocks = notion.get_page_blocks(page_id)
-                body = extract_body_content(blocks, config.body_max_chars)
+                # body_max_chars に達したら残りのブロックは取得しない
+                body = await read_notion(
+                    lambda: extract_body_content(
+                        notion.iter_page_blocks(page_id), config.body_max_chars
+                    )
+                )
                 if body:
                     content["body"] = body
-                time.sleep(0.35)  # Notion API レート制限対策 (3 req/s)
             except Exception as e:
-                logger.warning(f"Failed to fetch blocks for {page_id}: {e}")
+                logger.warning("Failed to fetch blocks for %s: %s", page_id, e)
 
         if not any(content.values()):
-            logger.warning(f"[{i+1}/{len(records)}] Skip empty content: {page_id}")
-            skipped += 1
-            continue
+            logger.warning("[%d] Skip empty content: %s", i + 1, page_id)
+            return None
+        return content
 
+    async def tag_one(i: int, page_id: str, content: dict, tags: list):
+        """タグ更新をキューに積む。バッチ推論で結果が得られなかった場合は単体で推論する。"""
         try:
-            tags = _infer_with_retry(tagger, content, page_id)
-            notion.update_tags(
-                page_id,
-                config.tag_property_name,
-                tags,
-                tagged_at_property=config.tagged_at_property_name,
-            )
-            logger.info(f"[{i+1}/{len(records)}] Tagged: {page_id} -> {tags}")
-            success += 1
+            if not tags:
+                if aborted.is_set():
+                    counts["failed"] += 1
+                    return
+                tags = await _infer_with_retry(tagger, content, page_id, llm_limiter)
         except RateLimitError as e:
-            logger.error(f"Rate limit hit at record {i+1}/{len(records)}: {e}")
-            logger.error("Aborting to avoid further rate limit errors.")
-            failed += len(records) - i
-            break
+            abort(i, e)
+            counts["failed"] += 1
+            return
         except Exception as e:
-            logger.error(f"Failed to tag {page_id}: {e}")
-            failed += 1
-
-        time.sleep(sleep_interval)
+            logger.error("Failed to tag %s: %s", page_id, e)
+            counts["failed"] += 1
+            return
+        await update_queue.put((i, page_id, tags))
+
+    async def tag_batch(start: int, pages: list, contents: list):
+        targets = [j for j, content in enumerate(contents) if content is not None]
+        if aborted.is_set():
+            counts["failed"] += len(targets)
+            return
+        batch_tags = [[] for _ in targets]
+
+        # 複数ページを1リクエストでまとめて推論
+        if len(targets) > 1:
+            try:
+                batch_tags = await tagger.tag_batch_async(
+                    [contents[j] for j in targets], limiter=llm_limiter
+                )
+            except RateLimitError as e:
+                abort(start, e)
+                counts["failed"] += len(targets)
+                return
+            except Exception as e:
+                logger.warning(
+                    "Batch tagging failed at record %d, falling back to single requests: %s",
+                    start + 1,
+                    e,
+                )
+
+        await asyncio.gather(
+            *(
+                tag_one(start + j, pages[j]["id"], contents[j], tags)
+                for j, tags in zip(targets, batch_tags)
+            )
+        )
 
-    return success, failed, skipped
+    async def process_batch(start: int, pages: list):
+        # 本文の取得はタグ付けより先行させ、LLMの待ち時間と重ねる
+        try:
+            if aborted.is_set():
+                counts["failed"] += len(pages)
+                return
+            contents = await asyncio.gather(
+                *(prepare(start + j, page) for j, page in enumerate(pages))
+            )
+            counts["skipped"] += contents.count(None)
+            if len(pages) > contents.count(None):
+                async with semaphore:
+                    await tag_batch(start, pages, contents)
+        finally:
+            prefetch_window.release()
+
+    notion.throttle = throttle_notion
+    writers = [asyncio.create_task(write_updates()) for _ in range(UPDATE_WRITERS)]
+    # レコードはバッチ単位で逐次読み出す（ページネーションのAPI呼び出しもここで発生）
+    record_iter = iter(records)
+    tasks = []
+    start = 0
+    exhausted = False
+    try:
+        while not aborted.is_set():
+            await prefetch_window.acquire()
+            pages = await read_notion(lambda: list(islice(record_iter, batch_size)))
+            if not pages:
+                prefetch_window.release()
+                exhausted = True
+                break
+            tasks.append(asyncio.create_task(process_batch(start, pages)))
+            start += len(pages)
+        await asyncio.gather(*tasks)
+        if not exhausted:
+            # 中断後のレコードは読み出していないため、件数の集計にも含まれない
+            logger.warning(
+                "Stopped early after reading %d records; remaining records were not read "
+                "and are not included in the counts",
+                start,
+            )
+        # キューに残ったタグ更新の書き込み完了を待つ
+        await update_queue.join()
+    finally:
+        for writer in writers:
+            writer.cancel()
+        notion.throttle = None
+        # リミッター待ちのワーカーはイベントループの終了時に解放されるため、ここでは待たない
+        notion_executor.shutdown(wait=False)
+    return counts["success"], counts["failed"], counts["skipped"]
 
 
 def main():
@@ -139,9 +338,11 @@ def main():
     )
     args = parser.parse_args()
 
-    config = Config()
-
+    config = get_config()
     if args.llm:
+        # get_config() はキャッシュ済みのため直接書き換えず、コピーに設定する
+        # （replace は __post_init__ で環境変数を再適用するため引数では渡さない）
+        config = dataclasses.replace(config)
         config.llm_provider = args.llm
 
     if not config.notion_api_key or not config.notion_database_id:
@@ -154,28 +355,29 @@ def main():
     existing_tags = []
     try:
         existing_tags = notion.get_existing_tags(config.tag_property_name)
-        logger.info(f"Existing tags: {len(existing_tags)} tags found")
+        logger.info("Existing tags: %d tags found", len(existing_tags))
     except Exception as e:
-        logger.warning(f"Failed to fetch existing tags: {e}")
+        logger.warning("Failed to fetch existing tags: %s", e)
 
     tagger = create_tagger(config.llm_provider, config, existing_tags)
-    logger.info(f"Using LLM: {config.llm_provider}")
+    logger.info("Using LLM: %s", config.llm_provider)
 
     if args.mode == "initial":
         logger.info("Initial mode: Processing all records")
-        records = notion.get_all_records()
+        records = notion.iter_all_records()
     else:
-        logger.info(f"Incremental mode: Processing records updated in last {args.hours}h")
-        records = notion.get_recently_updated(args.hours)
-
-    logger.info(f"Found {len(records)} records to process")
-
-    if not records:
-        logger.info("No records to process. Done.")
-        return
-
-    success, failed, skipped = process_records(records, notion, tagger, config, args.hours)
-    logger.info(f"Done. Success: {success}, Failed: {failed}, Skipped: {skipped}")
+        logger.info("Incremental mode: Processing records updated in last %dh", args.hours)
+        records = notion.iter_recently_updated(args.hours, config.tagged_at_property_name)
+
+    success, failed, skipped = process_records(
+        records,
+        notion,
+        tagger,
+        config,
+        args.hours,
+        check_tagged_at=args.mode == "initial",
+    )
+    logger.info("Done. Success: %d, Failed: %d, Skipped: %d", success, failed, skipped)
 
 
 if __name__ == "__main__":
@@ -7,93 +7,187 @@ notion-client v2.6.0以降、Notion API 2025-09-03対応で
 databases.query() → data_sources.query() に移行。
 """
 
-from notion_client import Client
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterator
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+from notion_client import Client
+from notion_client.helpers import iterate_paginated_api
+
+logger = logging.getLogger(__name__)
+
+# data_source_id・既存タグのディスクキャッシュ
+META_CACHE_PATH = Path.home() / ".cache" / "notion_tagger" / "meta.json"
+META_CACHE_TTL_SECONDS = 3600
+
+# blocks.children.list の1リクエストあたりの取得件数（APIの上限値）
+BLOCKS_PAGE_SIZE = 100
+
+# Notion API用のコネクションプール（HTTP/2で1接続に多重化）
+NOTION_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=10, max_connections=10)
 
 
 class NotionDB:
-    def __init__(self, api_key: str, database_id: str):
-        self.client = Client(auth=api_key)
+    def __init__(self, api_key: str, database_id: str, cache_path: Path | None = META_CACHE_PATH):
+        self.client = Client(
+            auth=api_key,
+            client=httpx.Client(http2=True, limits=NOTION_HTTP_LIMITS),
+        )
         self.database_id = database_id
-        self._data_source_id = None
+        self.cache_path = cache_path
+        self._meta = None
+        self._refresh_thread = None
+        # ページネーションの各APIリクエスト直前に呼ぶ関数（レート制限の待機用）
+        self.throttle = None
+
+    def _paginate(self, method, **kwargs) -> Iterator[dict]:
+        """iterate_paginated_api と同じだが、各リクエストの前に throttle で待機する"""
+
+        def request(**request_kwargs):
+            if self.throttle is not None:
+                self.throttle()
+            return method(**request_kwargs)
+
+        yield from iterate_paginated_api(request, **kwargs)
+
+    def _load_cache(self) -> dict | None:
+        """ディスクキャッシュからこのDBのメタ情報を読み込む"""
+        if self.cache_path is None:
+            return None
+        try:
+            meta = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(meta, dict) or meta.get("db_id") != self.database_id:
+            return None
+        return meta
+
+    def _save_cache(self, meta: dict):
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.cache_path)
+        except OSError as e:
+            logger.warning("Failed to write cache %s: %s", self.cache_path, e)
+
+    def _fetch_meta(self) -> dict:
+        """databases.retrieve 1回でdata_source_idとmulti_selectの選択肢を取得"""
+        db_info = self.client.databases.retrieve(database_id=self.database_id)
+        tag_options = {}
+        for name, prop in db_info.get("properties", {}).items():
+            if "multi_select" in prop:
+                options = prop["multi_select"].get("options", [])
+                tag_options[name] = [opt["name"] for opt in options]
+        meta = {
+            "db_id": self.database_id,
+            "data_source_id": db_info["data_sources"][0]["id"],
+            "tag_options": tag_options,
+            "cached_at": time.time(),
+        }
+        self._save_cache(meta)
+        return meta
+
+    def _refresh_meta(self):
+        try:
+            self._meta = self._fetch_meta()
+        except Exception as e:
+            logger.warning("Failed to refresh database metadata, keep using cache: %s", e)
+
+    def _get_meta(self) -> dict:
+        """DBのメタ情報を取得（stale-while-revalidate）
+
+        キャッシュが期限切れの場合も古い値をそのまま返し、
+        バックグラウンドで再取得する。ただし既存タグは get_existing_tags で
+        再取得の完了を待ってから返す。
+        """
+        if self._meta is None:
+            self._meta = self._load_cache()
+            if self._meta is None:
+                self._meta = self._fetch_meta()
+            elif time.time() - self._meta.get("cached_at", 0) >= META_CACHE_TTL_SECONDS:
+                self._refresh_thread = threading.Thread(target=self._refresh_meta, daemon=True)
+                self._refresh_thread.start()
+        return self._meta
 
     def _get_data_source_id(self) -> str:
         """データベースからdata_source_idを取得（遅延初期化）"""
-        if self._data_source_id is None:
-            db_info = self.client.databases.retrieve(database_id=self.database_id)
-            self._data_source_id = db_info["data_sources"][0]["id"]
-        return self._data_source_id
+        return self._get_meta()["data_source_id"]
 
-    def get_all_records(self) -> list:
-        """全レコード取得（初回実行用）"""
+    def iter_all_records(self) -> Iterator[dict]:
+        """全レコードを逐次取得（初回実行用）"""
         data_source_id = self._get_data_source_id()
-        results = []
-        cursor = None
-
-        while True:
-            response = self.client.data_sources.query(
-                data_source_id=data_source_id,
-                start_cursor=cursor,
-            )
-            results.extend(response["results"])
-
-            if not response["has_more"]:
-                break
-            cursor = response["next_cursor"]
-
-        return results
-
-    def get_recently_updated(self, hours: int = 24) -> list:
-        """指定時間内に更新されたレコード取得"""
+        yield from self._paginate(
+            self.client.data_sources.query,
+            data_source_id=data_source_id,
+        )
+
+    def iter_recently_updated(
+        self, hours: int = 24, tagged_at_property: str | None = None
+    ) -> Iterator[dict]:
+        """指定時間内に更新されたレコードを逐次取得
+
+        tagged_at_property 指定時は、同じ時間内にタグ付け済みのレコードを
+        API側のフィルタで除外する。
+        """
         data_source_id = self._get_data_source_id()
         cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
 
-        results = []
-        cursor = None
-
-        while True:
-            response = self.client.data_sources.query(
-                data_source_id=data_source_id,
-                filter={
-                    "timestamp": "last_edited_time",
-                    "last_edited_time": {
-                        "after": cutoff.isoformat(),
+        query_filter = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {
+                "after": cutoff.isoformat(),
+            },
+        }
+        if tagged_at_property:
+            query_filter = {
+                "and": [
+                    query_filter,
+                    {
+                        "or": [
+                            {"property": tagged_at_property, "date": {"is_empty": True}},
+                            {"property": tagged_at_property, "date": {"on_or_before": cutoff.isoformat()}},
+                        ],
                     },
-                },
-                start_cursor=cursor,
-            )
-            results.extend(response["results"])
-
-            if not response["has_more"]:
-                break
-            cursor = response["next_cursor"]
+                ],
+            }
 
-        return results
+        yield from self._paginate(
+            self.client.data_sources.query,
+            data_source_id=data_source_id,
+            filter=query_filter,
+        )
 
     def get_existing_tags(self, tag_property: str) -> list:
-        """DBの既存タグ一覧を取得"""
-        db_info = self.client.databases.retrieve(database_id=self.database_id)
-        prop = db_info.get("properties", {}).get(tag_property, {})
-        options = prop.get("multi_select", {}).get("options", [])
-        return [opt["name"] for opt in options]
-
-    def get_page_blocks(self, page_id: str) -> list:
-        """ページ直下のブロック一覧を取得（1階層のみ）"""
-        results = []
-        cursor = None
-
-        while True:
-            response = self.client.blocks.children.list(
-                block_id=page_id,
-                start_cursor=cursor,
-            )
-            results.extend(response["results"])
-
-            if not response["has_more"]:
-                break
-            cursor = response["next_cursor"]
-
-        return results
+        """DBの既存タグ一覧を取得
+
+        前回の実行で追加されたタグもプロンプトに含めるため、
+        キャッシュが期限切れなら再取得の完了を待つ（失敗時はキャッシュの値を使う）。
+        """
+        meta = self._get_meta()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            meta = self._meta
+        return list(meta["tag_options"].get(tag_property, []))
+
+    def iter_page_blocks(self, page_id: str) -> Iterator[dict]:
+        """ページ直下のブロックを逐次取得（1階層のみ）
+
+        次のカーソルは消費側が読み進めたときに初めて取得するため、
+        途中で読むのをやめれば残りのAPI呼び出しは発生しない。
+        """
+        yield from self._paginate(
+            self.client.blocks.children.list,
+            block_id=page_id,
+            page_size=BLOCKS_PAGE_SIZE,
+        )
 
     def update_tags(
         self,
@@ -0,0 +1,26 @@
+"""APIレート制限モジュール"""
+
+import asyncio
+
+
+class AsyncRateLimiter:
+    """リクエストの開始間隔を interval 秒以上に保つ非同期レートリミッター。
+
+    固定時間のsleepではなく、前回のリクエスト開始からの経過時間が
+    interval に満たない分だけ待機する（容量1のトークンバケット）。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """次のリクエストを開始してよいタイミングまで待機する"""
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_at - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                now = self._next_at
+            self._next_at = now + self.interval
@@ -4,14 +4,43 @@ Gemini（無料、デフォルト）とClaude（高精度、オプション）
 タグはPascalCase・英語統一で、9カテゴリに分類される。
 """
 
+import asyncio
+import hashlib
+import importlib
 import json
 import logging
 import re
+import sqlite3
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import cached_property, lru_cache
+from pathlib import Path
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # orjson未導入環境では標準ライブラリにフォールバック
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 
+def _json_dumps(obj) -> str:
+    """プロンプト埋め込み用のコンパクトなJSON文字列"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _json_loads(text: str):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
 class RateLimitError(Exception):
     """LLM APIのレートリミットエラー（429）"""
     pass
@@ -57,155 +86,576 @@ TAG_CATEGORIES = {
 }
 
 
+# カテゴリ定義のプロンプト表現（実行中は不変なので読み込み時に1度だけ組み立てる）
+_CATEGORIES_TEXT = "\n".join(
+    f"  - {name}: {info['description']} (e.g. {', '.join(info['examples'])})"
+    for name, info in TAG_CATEGORIES.items()
+)
+
+# タグ付けルールのテンプレート。max_tags と existing_tags だけを呼び出しごとに埋め込む。
+_RULES_TEMPLATE = """You are a technical content tagger. Analyze the content below and assign appropriate tags.
+
+## Rules
+1. Assign between 1 and {max_tags} tags (at least 1 tag is MANDATORY).
+2. Tags MUST be in English and PascalCase (e.g. GitHubActions, MachineLearning, RestApi).
+3. Select tags from the following categories:
+""" + _CATEGORIES_TEXT + """
+4. If the content does not fit Language/Framework/Infrastructure/Cicd/Database/Architecture/Observability/AiMl, use a concrete tag from the "Other" category (e.g. Security, Testing, Design).
+5. Do NOT use generic tags like "Other" or "Misc" — always use a specific descriptive name.
+6. Prefer broader category-level tags over highly specific ones to keep the total tag count manageable.
+{existing_tags}"""
+
+
+# コードブロックの中身を取り出す。```json ... ``` を優先し、なければ最初の ``` ... ``` を使う。
+# 閉じフェンスがない場合は末尾までを対象とする。
+_JSON_FENCE_RE = re.compile(r"```json(.*?)(?:```|$)", re.DOTALL)
+_FENCE_RE = re.compile(r"```(.*?)(?:```|$)", re.DOTALL)
+
+
+# _to_pascal_case 用: 既にPascalCaseか / 単語の区切り（スペース・ハイフン・アンダースコア・ドット）
+_PASCAL_RE = re.compile(r"^[A-Z][a-zA-Z0-9]*$")
+_WORD_SPLIT_RE = re.compile(r"[\s\-_\.]+")
+
+
+@lru_cache(maxsize=1024)
 def _to_pascal_case(text: str) -> str:
-    """文字列をPascalCaseに変換する"""
+    """文字列をPascalCaseに変換する（同じタグ名が繰り返し返るため結果をキャッシュ）"""
     text = text.strip()
     if not text:
         return text
     # 既にPascalCaseの場合はそのまま返す
-    if re.match(r"^[A-Z][a-zA-Z0-9]*$", text):
+    if _PASCAL_RE.match(text):
         return text
     # スペース・ハイフン・アンダースコア・ドットで分割
-    words = re.split(r"[\s\-_\.]+", text)
+    words = _WORD_SPLIT_RE.split(text)
     return "".join(word.capitalize() for word in words if word)
 
 
-class BaseTagger(ABC):
-    def __init__(self, available_tags: list = None):
-        self.available_tags = available_tags or []
+def _import_sdk(module: str, package: str):
+    """選択されたプロバイダのSDKだけを遅延インポートする"""
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(f"{package} is required for this LLM provider: pip install {package}") from e
 
-    def _build_prompt(self, content: dict, max_tags: int = 5) -> str:
-        # カテゴリ定義のフォーマット
-        category_lines = []
-        for cat_name, cat_info in TAG_CATEGORIES.items():
-            examples = ", ".join(cat_info["examples"])
-            category_lines.append(
-                f"  - {cat_name}: {cat_info['description']} (e.g. {examples})"
-            )
-        categories_text = "\n".join(category_lines)
 
-        # 既存タグの提示
-        existing_tags_text = ""
+# 推論結果キャッシュの最大件数（超えたら最も長く参照されていないものから破棄）
+TAG_CACHE_MAX_SIZE = 1024
+
+# LLM API用のコネクションプール（HTTP/2で接続を使い回し、並行リクエストのTLSハンドシェイクを省く）
+LLM_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=10, max_connections=10)
+
+# 推論結果の永続キャッシュ（実行をまたいで同一内容のページの再推論を避ける）
+TAG_CACHE_PATH = Path.home() / ".cache" / "notion_tagger" / "tags.sqlite3"
+
+# 永続キャッシュの有効期間と最大件数（開くときに期限切れ・超過分を削除する）
+TAG_CACHE_TTL_SECONDS = 30 * 24 * 3600
+TAG_CACHE_MAX_ROWS = 10000
+
+# プロンプトに埋め込む各プロパティ値の最大文字数（本文の既定上限 BODY_MAX_CHARS と同じ）。
+# 長すぎる値は切り詰め、入力トークン数とレイテンシを一定に抑える。
+# create_tagger では BODY_MAX_CHARS がこれより大きければそちらに合わせる。
+MAX_VALUE_CHARS = 4000
+
+# この文字数未満の短いcontentは、既存タグとの文字列一致で得られればLLMを呼ばない
+LOCAL_TAG_MAX_CHARS = 100
+
+# LLMを呼ばずに済ませるのに必要な、異なる既存タグの一致数。
+# 1語だけの一致は "Spring cleaning" のような一般的な英単語と区別できないためLLMに任せる。
+LOCAL_TAG_MIN_HITS = 2
+
+# 既存タグとの照合から除外するURL（ドメイン名などをタグと誤認しないため）
+_URL_RE = re.compile(r"https?://\S+")
+
+
+class BaseTagger(ABC):
+    def __init__(
+        self,
+        available_tags: list = None,
+        cache_path: Path | None = None,
+        max_value_chars: int = MAX_VALUE_CHARS,
+    ):
+        self.available_tags = available_tags or []
+        self.max_value_chars = max_value_chars
+        # 既存タグの小文字マップ（表記揺れの照合用、実行中は不変）
+        self._existing_lower_map = {t.lower(): t for t in self.available_tags}
+        # 既存タグの提示（実行中は不変なので1度だけ組み立てる）
+        self._existing_tags_text = ""
         if self.available_tags:
-            existing_tags_text = f"""
+            self._existing_tags_text = f"""
 ## Existing Tags (MUST prefer these over creating new ones)
 {', '.join(self.available_tags)}
 
 IMPORTANT: Always select from existing tags above when applicable.
 Only create a new tag if no existing tag fits AND the topic is clearly important.
 """
+        self._prompt_templates = {}
+        # 短いcontent向け: 既存タグ名を表記どおり（大文字小文字を区別）英数字の境界で照合する正規表現
+        self._local_tag_re = None
+        if self.available_tags:
+            names = sorted(self._existing_lower_map.values(), key=len, reverse=True)
+            self._local_tag_re = re.compile(
+                r"(?<![A-Za-z0-9])(?:" + "|".join(map(re.escape, names)) + r")(?![A-Za-z0-9])"
+            )
+        self._tag_cache = OrderedDict()
+        self._tag_cache_lock = threading.Lock()
+        self._tag_db = self._open_tag_db(cache_path) if cache_path is not None else None
+
+    def _build_rules(self, max_tags: int) -> str:
+        """単一・バッチ共通のタグ付けルール部分を組み立てる"""
+        return _RULES_TEMPLATE.format(max_tags=max_tags, existing_tags=self._existing_tags_text)
+
+    def _prompt_template(self, max_tags: int, batch: bool = False) -> tuple:
+        """content 以外を埋め込み済みのプロンプト前半・後半を返す
+
+        ルール・カテゴリ・既存タグは実行中に変わらないため、
+        max_tags ごとに1度だけ組み立ててキャッシュする。
+        """
+        key = (max_tags, batch)
+        template = self._prompt_templates.get(key)
+        if template is None:
+            rules = self._build_rules(max_tags)
+            if batch:
+                template = (
+                    f"{rules}\n## Contents\n"
+                    "Each item below is a separate page. Apply the rules to every item independently.\n",
+                    "\n\nRespond in JSON format only, with one result per item id:\n"
+                    '{"results": [{"id": 0, "tags": ["Tag1", "Tag2"]}]}',
+                )
+            else:
+                template = (
+                    f"{rules}\n## Content\n",
+                    '\n\nRespond in JSON format only:\n{"tags": ["Tag1", "Tag2"]}',
+                )
+            self._prompt_templates[key] = template
+        return template
+
+    def _trim_content(self, content: dict) -> dict:
+        """max_value_chars を超える文字列値を切り詰めたcontentを返す"""
+        limit = self.max_value_chars
+        if all(not isinstance(v, str) or len(v) <= limit for v in content.values()):
+            return content
+        return {
+            k: v[:limit] + "…" if isinstance(v, str) and len(v) > limit else v
+            for k, v in content.items()
+        }
 
-        return f"""You are a technical content tagger. Analyze the content below and assign appropriate tags.
-
-## Rules
-1. Assign between 1 and {max_tags} tags (at least 1 tag is MANDATORY).
-2. Tags MUST be in English and PascalCase (e.g. GitHubActions, MachineLearning, RestApi).
-3. Select tags from the following categories:
-{categories_text}
-4. If the content does not fit Language/Framework/Infrastructure/Cicd/Database/Architecture/Observability/AiMl, use a concrete tag from the "Other" category (e.g. Security, Testing, Design).
-5. Do NOT use generic tags like "Other" or "Misc" — always use a specific descriptive name.
-6. Prefer broader category-level tags over highly specific ones to keep the total tag count manageable.
-{existing_tags_text}
-## Content
-{json.dumps(content, ensure_ascii=False, indent=2)}
-
-Respond in JSON format only:
-{{"tags": ["Tag1", "Tag2"]}}"""
+    def _build_prompt(self, content: dict, max_tags: int = 5) -> str:
+        head, tail = self._prompt_template(max_tags)
+        return head + _json_dumps(self._trim_content(content)) + tail
+
+    def _build_batch_prompt(self, contents: list, max_tags: int = 5) -> str:
+        """複数ページを1回のリクエストでタグ付けするプロンプト"""
+        head, tail = self._prompt_template(max_tags, batch=True)
+        items = [
+            {"id": i, "content": self._trim_content(content)} for i, content in enumerate(contents)
+        ]
+        return head + _json_dumps(items) + tail
+
+    def _parse_batch_tags(self, text: str, count: int) -> list:
+        """バッチレスポンスを入力順のタグリストに変換（結果のないidは空リスト）"""
+        result = self._extract_json(text)
+        tags_by_id = {}
+        for row in result.get("results", []):
+            if isinstance(row, dict):
+                # idを文字列で返すモデルもあるため整数に揃える
+                try:
+                    tags_by_id[int(row.get("id"))] = row.get("tags", [])
+                except (TypeError, ValueError):
+                    continue
+        return [self._normalize_tags(tags_by_id.get(i, [])) for i in range(count)]
 
     def _normalize_tags(self, tags: list) -> list:
         """タグをPascalCaseに正規化し、既存タグとの表記揺れを吸収する"""
-        # 既存タグの小文字マップ（高速照合用）
-        existing_lower_map = {t.lower(): t for t in self.available_tags}
+        existing_lower_map = self._existing_lower_map
         normalized = []
         seen = set()
         for tag in tags:
             pascal = _to_pascal_case(tag)
             lower_key = pascal.lower()
-            # 既存タグに同名（大文字小文字無視）があればそちらを採用
-            if lower_key in existing_lower_map:
-                pascal = existing_lower_map[lower_key]
-            # 重複排除
-            if lower_key not in seen:
-                seen.add(lower_key)
-                normalized.append(pascal)
+            # 重複は既存タグとの照合より先に除外する
+            if lower_key in seen:
+                continue
+            seen.add(lower_key)
+            # 既存タグに同名（大文字小文字無視）があればそちらを採用（既存タグがなければ照合しない）
+            if existing_lower_map:
+                pascal = existing_lower_map.get(lower_key, pascal)
+            normalized.append(pascal)
         return normalized
 
+    @staticmethod
+    def _content_key(content: dict, max_tags: int) -> bytes:
+        """content と max_tags からキャッシュキー（ハッシュ）を生成"""
+        if orjson is not None:
+            payload = orjson.dumps([max_tags, content], option=orjson.OPT_SORT_KEYS)
+        else:
+            payload = json.dumps(
+                [max_tags, content], ensure_ascii=False, sort_keys=True, separators=(",", ":")
+            ).encode()
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    @cached_property
+    def _cache_scope(self) -> str:
+        """永続キャッシュの区分（Tagger・モデル・プロンプトが変われば別の区分になる）
+
+        タグは既存タグに合わせて正規化しているため、既存タグの一覧もプロンプトの
+        一部として区分に含める。model_name はサブクラスの __init__ で設定されるので、
+        最初に参照したときに求める。
+        """
+        prompt = (_RULES_TEMPLATE + self._existing_tags_text).encode()
+        fingerprint = hashlib.blake2b(prompt, digest_size=8).hexdigest()
+        return f"{type(self).__name__}:{getattr(self, 'model_name', '')}:{fingerprint}"
+
+    @staticmethod
+    def _open_tag_db(cache_path: Path):
+        """推論結果の永続キャッシュ（SQLite）を開く。開けなければメモリキャッシュのみで動作する。
+
+        開くときに有効期間を過ぎた行と、新しい順で TAG_CACHE_MAX_ROWS 件を超える行を削除する。
+        """
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(cache_path), check_same_thread=False, isolation_level=None)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tag_results ("
+                "scope TEXT NOT NULL, key BLOB NOT NULL, tags TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (scope, key))"
+            )
+            db.execute(
+                "DELETE FROM tag_results WHERE created_at < ?",
+                (time.time() - TAG_CACHE_TTL_SECONDS,),
+            )
+            db.execute(
+                "DELETE FROM tag_results WHERE rowid NOT IN ("
+                "SELECT rowid FROM tag_results ORDER BY created_at DESC LIMIT ?)",
+                (TAG_CACHE_MAX_ROWS,),
+            )
+            return db
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Failed to open tag cache %s: %s", cache_path, e)
+            return None
+
+    def _remember_tags(self, key: bytes, tags: list):
+        """メモリキャッシュに登録する（ロック取得済みで呼ぶ）"""
+        self._tag_cache[key] = tags
+        self._tag_cache.move_to_end(key)
+        if len(self._tag_cache) > TAG_CACHE_MAX_SIZE:
+            self._tag_cache.popitem(last=False)
+
+    def _get_cached_tags(self, key: bytes):
+        with self._tag_cache_lock:
+            tags = self._tag_cache.get(key)
+            if tags is not None:
+                self._tag_cache.move_to_end(key)
+            elif self._tag_db is not None:
+                try:
+                    row = self._tag_db.execute(
+                        "SELECT tags FROM tag_results WHERE scope = ? AND key = ?",
+                        (self._cache_scope, key),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning("Failed to read tag cache: %s", e)
+                    row = None
+                if row is not None:
+                    tags = _json_loads(row[0])
+                    self._remember_tags(key, tags)
+        return list(tags) if tags is not None else None
+
+    def _set_cached_tags(self, key: bytes, tags: list):
+        with self._tag_cache_lock:
+            self._remember_tags(key, list(tags))
+            if self._tag_db is not None:
+                try:
+                    self._tag_db.execute(
+                        "INSERT OR REPLACE INTO tag_results (scope, key, tags, created_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (self._cache_scope, key, _json_dumps(tags), time.time()),
+                    )
+                except sqlite3.Error as e:
+                    logger.warning("Failed to write tag cache: %s", e)
+
+    def _match_local_tags(self, content: dict, max_tags: int) -> list:
+        """短いcontentに既存タグ名が LOCAL_TAG_MIN_HITS 種類以上含まれていれば、それをタグとして返す
+
+        URLは照合の対象にしない。一致が足りなければ空リストを返し、LLMでの推論に任せる。
+        """
+        if self._local_tag_re is None:
+            return []
+        text = " ".join(str(value) for value in content.values())
+        if len(text) >= LOCAL_TAG_MAX_CHARS:
+            return []
+        tags = []
+        for match in self._local_tag_re.finditer(_URL_RE.sub(" ", text)):
+            if match.group(0) not in tags:
+                tags.append(match.group(0))
+        if len(tags) < LOCAL_TAG_MIN_HITS:
+            return []
+        return tags[:max_tags]
+
+    def tag(self, content: dict, max_tags: int = 5) -> list:
+        """タグを推論する。
+
+        短いcontentは既存タグとの一致で決め、同一内容のページは
+        前回の推論結果を再利用する。どちらでもなければLLMで推論する。
+        """
+        tags = self._match_local_tags(content, max_tags)
+        if tags:
+            return tags
+        key = self._content_key(content, max_tags)
+        tags = self._get_cached_tags(key)
+        if tags is None:
+            tags = self.infer_tags(content, max_tags)
+            if tags:
+                self._set_cached_tags(key, tags)
+        return tags
+
+    async def tag_async(self, content: dict, max_tags: int = 5, limiter=None) -> list:
+        """tag の非同期版。LLM呼び出しは infer_tags_async で行う。
+
+        limiter（AsyncRateLimiter）は実際にLLMを呼ぶときだけ待機する。
+        """
+        tags = self._match_local_tags(content, max_tags)
+        if tags:
+            return tags
+        key = self._content_key(content, max_tags)
+        tags = self._get_cached_tags(key)
+        if tags is None:
+            if limiter is not None:
+                await limiter.acquire()
+            tags = await self.infer_tags_async(content, max_tags)
+            if tags:
+                self._set_cached_tags(key, tags)
+        return tags
+
+    def _lookup_batch(self, contents: list, max_tags: int) -> tuple:
+        """既存タグとの一致・キャッシュで決まらなかったページを洗い出す
+
+        (キー, 決まったタグ（未定はNone）, LLMに送るcontent) を返す。
+        LLMに送るcontentはバッチ内の重複を1件にまとめる。
+        """
+        keys = [self._content_key(content, max_tags) for content in contents]
+        results = [
+            self._match_local_tags(content, max_tags) or self._get_cached_tags(key)
+            for key, content in zip(keys, contents)
+        ]
+        pending = {}
+        for key, content, tags in zip(keys, contents, results):
+            if tags is None:
+                pending.setdefault(key, content)
+        return keys, results, pending
+
+    def _merge_batch(self, keys: list, results: list, pending: dict, inferred: list) -> list:
+        """LLMの推論結果をキャッシュに登録し、入力順のタグリストにまとめる"""
+        inferred_by_key = dict(zip(pending, inferred))
+        for key, tags in inferred_by_key.items():
+            # 空の結果は単体推論にフォールバックさせるためキャッシュしない
+            if tags:
+                self._set_cached_tags(key, tags)
+        return [
+            tags if tags is not None else list(inferred_by_key.get(key, []))
+            for key, tags in zip(keys, results)
+        ]
+
+    def tag_batch(self, contents: list, max_tags: int = 5) -> list:
+        """複数ページのタグを推論する。tag と同じ判定で残ったページだけをLLMに送る。"""
+        keys, results, pending = self._lookup_batch(contents, max_tags)
+        if not pending:
+            return results
+        inferred = self.infer_tags_batch(list(pending.values()), max_tags)
+        return self._merge_batch(keys, results, pending, inferred)
+
+    async def tag_batch_async(self, contents: list, max_tags: int = 5, limiter=None) -> list:
+        """tag_batch の非同期版。limiter は実際にLLMを呼ぶときだけ待機する。"""
+        keys, results, pending = self._lookup_batch(contents, max_tags)
+        if not pending:
+            return results
+        if limiter is not None:
+            await limiter.acquire()
+        inferred = await asyncio.to_thread(
+            self.infer_tags_batch, list(pending.values()), max_tags
+        )
+        return self._merge_batch(keys, results, pending, inferred)
+
     @abstractmethod
     def infer_tags(self, content: dict, max_tags: int = 5) -> list:
         pass
 
+    def infer_tags_batch(self, contents: list, max_tags: int = 5) -> list:
+        """複数ページのタグを推論。バッチ非対応のTaggerは1件ずつ推論する。"""
+        return [self.infer_tags(content, max_tags) for content in contents]
+
+    async def infer_tags_async(self, content: dict, max_tags: int = 5) -> list:
+        """タグを非同期に推論。非同期SDKを持たないTaggerはスレッドで infer_tags を実行する。"""
+        return await asyncio.to_thread(self.infer_tags, content, max_tags)
+
     @staticmethod
     def _extract_json(text: str) -> dict:
         """LLMレスポンスからJSONを抽出"""
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        return json.loads(text.strip())
+        match = _JSON_FENCE_RE.search(text) or _FENCE_RE.search(text)
+        if match:
+            text = match.group(1)
+        return _json_loads(text.strip())
 
 
 class GeminiTagger(BaseTagger):
     """Gemini API（無料）"""
 
-    def __init__(self, api_key: str, available_tags: list = None):
-        super().__init__(available_tags)
-        from google import genai
-
-        self.client = genai.Client(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        available_tags: list = None,
+        cache_path: Path | None = None,
+        max_value_chars: int = MAX_VALUE_CHARS,
+    ):
+        super().__init__(available_tags, cache_path, max_value_chars)
+        genai = _import_sdk("google.genai", "google-genai")
+
+        pool_args = {"http2": True, "limits": LLM_HTTP_LIMITS}
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options={"client_args": pool_args, "async_client_args": pool_args},
+        )
         self.model_name = "gemini-2.5-flash-lite"
 
-    def infer_tags(self, content: dict, max_tags: int = 5) -> list:
+    @staticmethod
+    def _check_rate_limit(e: Exception):
+        if "429" in str(e) or "ResourceExhausted" in type(e).__name__:
+            raise RateLimitError(f"Gemini rate limit: {e}") from e
+
+    def _generate(self, prompt: str) -> str:
         try:
-            prompt = self._build_prompt(content, max_tags)
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
             )
-            result = self._extract_json(response.text)
-            tags = result.get("tags", [])
-            return self._normalize_tags(tags)
+            return response.text
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
+
+    async def _generate_async(self, prompt: str) -> str:
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+            )
+            return response.text
         except Exception as e:
-            if "429" in str(e) or "ResourceExhausted" in type(e).__name__:
-                raise RateLimitError(f"Gemini rate limit: {e}") from e
+            self._check_rate_limit(e)
             raise
 
+    def infer_tags(self, content: dict, max_tags: int = 5) -> list:
+        text = self._generate(self._build_prompt(content, max_tags))
+        result = self._extract_json(text)
+        return self._normalize_tags(result.get("tags", []))
+
+    async def infer_tags_async(self, content: dict, max_tags: int = 5) -> list:
+        text = await self._generate_async(self._build_prompt(content, max_tags))
+        result = self._extract_json(text)
+        return self._normalize_tags(result.get("tags", []))
+
+    def infer_tags_batch(self, contents: list, max_tags: int = 5) -> list:
+        text = self._generate(self._build_batch_prompt(contents, max_tags))
+        return self._parse_batch_tags(text, len(contents))
+
 
 class ClaudeTagger(BaseTagger):
     """Claude API（高精度）"""
 
-    def __init__(self, api_key: str, available_tags: list = None):
-        super().__init__(available_tags)
-        import anthropic
+    def __init__(
+        self,
+        api_key: str,
+        available_tags: list = None,
+        cache_path: Path | None = None,
+        max_value_chars: int = MAX_VALUE_CHARS,
+    ):
+        super().__init__(available_tags, cache_path, max_value_chars)
+        anthropic = _import_sdk("anthropic", "anthropic")
+
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            http_client=anthropic.DefaultHttpxClient(http2=True, limits=LLM_HTTP_LIMITS),
+        )
+        self.async_client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            http_client=anthropic.DefaultAsyncHttpxClient(http2=True, limits=LLM_HTTP_LIMITS),
+        )
+        self.model_name = "claude-sonnet-4-20250514"
 
-        self.client = anthropic.Anthropic(api_key=api_key)
+    @staticmethod
+    def _check_rate_limit(e: Exception):
+        if "RateLimitError" in type(e).__name__ or "429" in str(e):
+            raise RateLimitError(f"Claude rate limit: {e}") from e
 
-    def infer_tags(self, content: dict, max_tags: int = 5) -> list:
+    def _generate(self, prompt: str, max_tokens: int = 256) -> str:
         try:
-            prompt = self._build_prompt(content, max_tags)
-
             response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=256,
+                model=self.model_name,
+                max_tokens=max_tokens,
                 messages=[{"role": "user", "content": prompt}],
             )
+            return response.content[0].text
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
 
-            text = response.content[0].text
-            result = self._extract_json(text)
-            tags = result.get("tags", [])
-            return self._normalize_tags(tags)
+    async def _generate_async(self, prompt: str, max_tokens: int = 256) -> str:
+        try:
+            response = await self.async_client.messages.create(
+                model=self.model_name,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+            )
+            return response.content[0].text
         except Exception as e:
-            if "RateLimitError" in type(e).__name__ or "429" in str(e):
-                raise RateLimitError(f"Claude rate limit: {e}") from e
+            self._check_rate_limit(e)
             raise
 
+    def infer_tags(self, content: dict, max_tags: int = 5) -> list:
+        text = self._generate(self._build_prompt(content, max_tags))
+        result = self._extract_json(text)
+        return self._normalize_tags(result.get("tags", []))
+
+    async def infer_tags_async(self, content: dict, max_tags: int = 5) -> list:
+        text = await self._generate_async(self._build_prompt(content, max_tags))
+        result = self._extract_json(text)
+        return self._normalize_tags(result.get("tags", []))
+
+    def infer_tags_batch(self, contents: list, max_tags: int = 5) -> list:
+        prompt = self._build_batch_prompt(contents, max_tags)
+        text = self._generate(prompt, max_tokens=256 * len(contents))
+        return self._parse_batch_tags(text, len(contents))
+
+
+async def infer_tags_many(
+    tagger: BaseTagger,
+    contents: list,
+    max_tags: int = 5,
+    max_concurrency: int = 10,
+    limiter=None,
+) -> list:
+    """複数ページのタグを並行して推論し、入力順に返す。
+
+    同時リクエスト数を max_concurrency に抑え、limiter（AsyncRateLimiter）が
+    指定されていれば各リクエストの開始間隔も調整する。
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def one(content: dict) -> list:
+        async with semaphore:
+            return await tagger.tag_async(content, max_tags, limiter)
+
+    return await asyncio.gather(*(one(content) for content in contents))
+
 
 def create_tagger(provider: str, config, available_tags: list = None) -> BaseTagger:
     """LLMプロバイダーに応じたTaggerを生成"""
+    # 設定された本文の長さは切り詰めない
+    max_value_chars = max(config.body_max_chars, MAX_VALUE_CHARS)
     if provider == "claude":
         if not config.claude_api_key:
             raise ValueError("CLAUDE_API_KEY is not set")
-        return ClaudeTagger(config.claude_api_key, available_tags)
+        return ClaudeTagger(config.claude_api_key, available_tags, TAG_CACHE_PATH, max_value_chars)
     else:  # デフォルト: gemini
         if not config.gemini_api_key:
             raise ValueError("GEMINI_API_KEY is not set")
-        return GeminiTagger(config.gemini_api_key, available_tags)
+        return GeminiTagger(config.gemini_api_key, available_tags, TAG_CACHE_PATH, max_value_chars)
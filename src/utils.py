@@ -1,7 +1,9 @@
 """ユーティリティモジュール"""
 
-# extract_block_text が対応するブロックタイプ
-_RICH_TEXT_BLOCK_TYPES = {
+from collections.abc import Callable, Iterable, Iterator
+
+# extract_block_text が対応するブロックタイプ（code 以外はリッチテキストをそのまま結合）
+_RICH_TEXT_BLOCK_TYPES = frozenset({
     "paragraph",
     "heading_1",
     "heading_2",
@@ -12,7 +14,27 @@ _RICH_TEXT_BLOCK_TYPES = {
     "callout",
     "toggle",
     "to_do",
-}
+})
+
+
+def _rich_text_fragments(data: dict) -> Iterator[str]:
+    for rt in data.get("rich_text", []):
+        yield rt.get("plain_text", "")
+
+
+def _code_fragments(data: dict) -> Iterator[str]:
+    """code ブロックは言語ラベルを先頭に付ける"""
+    language = data.get("language", "")
+    if language:
+        yield f"[{language}] "
+    yield from _rich_text_fragments(data)
+
+
+# ブロックタイプ → テキスト断片を返す関数（1回の dict 参照で振り分ける）
+_BLOCK_FRAGMENT_HANDLERS: dict[str, Callable[[dict], Iterator[str]]] = dict.fromkeys(
+    _RICH_TEXT_BLOCK_TYPES, _rich_text_fragments
+)
+_BLOCK_FRAGMENT_HANDLERS["code"] = _code_fragments
 
 
 def extract_block_text(block: dict) -> str:
@@ -24,73 +46,92 @@ def extract_block_text(block: dict) -> str:
     非対応ブロックは空文字を返す。
     """
     block_type = block.get("type", "")
+    handler = _BLOCK_FRAGMENT_HANDLERS.get(block_type)
+    if handler is None:
+        return ""
+    return "".join(handler(block.get(block_type, {})))
 
-    if block_type in _RICH_TEXT_BLOCK_TYPES:
-        rich_texts = block.get(block_type, {}).get("rich_text", [])
-        return "".join(rt.get("plain_text", "") for rt in rich_texts)
-
-    if block_type == "code":
-        code_data = block.get("code", {})
-        rich_texts = code_data.get("rich_text", [])
-        text = "".join(rt.get("plain_text", "") for rt in rich_texts)
-        language = code_data.get("language", "")
-        if language:
-            return f"[{language}] {text}"
-        return text
-
-    return ""
 
+def extract_body_content(blocks: Iterable[dict], max_chars: int = 4000) -> str:
+    """ブロック列からプレーンテキストを改行区切りで結合して返す。
 
-def extract_body_content(blocks: list, max_chars: int = 4000) -> str:
-    """ブロックリストからプレーンテキストを結合して返す。
-
-    max_chars を超えた時点で切り詰める。
+    ブロックごとの文字列は作らず、テキスト断片を1パスで走査する。
+    max_chars に達した時点で走査を打ち切り、以降のブロックは読み出さない。
     """
-    lines = []
+    parts: list[str] = []
     total = 0
     for block in blocks:
-        text = extract_block_text(block)
-        if not text:
+        # ブロックごとの関数呼び出しを増やさないよう、振り分けはここで直接行う
+        block_type = block.get("type", "")
+        handler = _BLOCK_FRAGMENT_HANDLERS.get(block_type)
+        if handler is None:
             continue
-        if total + len(text) > max_chars:
+        started = False
+        for fragment in handler(block.get(block_type, {})):
+            if not fragment:
+                continue
+            if not started:
+                started = True
+                if parts:
+                    # 区切りの改行の後に1文字も入らないなら打ち切る
+                    if total + 1 >= max_chars:
+                        return "".join(parts)
+                    parts.append("\n")
+                    total += 1
             remaining = max_chars - total
-            if remaining > 0:
-                lines.append(text[:remaining])
-            break
-        lines.append(text)
-        total += len(text) + 1  # +1 for newline
-    return "\n".join(lines)
+            if len(fragment) >= remaining:
+                parts.append(fragment[:remaining])
+                return "".join(parts)
+            parts.append(fragment)
+            total += len(fragment)
+    return "".join(parts)
+
+
+def _title_text(prop: dict) -> str:
+    return "".join(t.get("plain_text", "") for t in prop.get("title", []))
 
 
-def extract_content(page: dict, properties: list) -> dict:
+def _rich_text_text(prop: dict) -> str:
+    return "".join(t.get("plain_text", "") for t in prop.get("rich_text", []))
+
+
+def _url_text(prop: dict) -> str | None:
+    return prop.get("url", "")
+
+
+def _select_text(prop: dict) -> str | None:
+    select = prop.get("select")
+    return select.get("name", "") if select else None
+
+
+def _multi_select_text(prop: dict) -> str:
+    return ", ".join(s.get("name", "") for s in prop.get("multi_select", []))
+
+
+# プロパティタイプ → 値の取り出し関数（None を返した場合は content に含めない）
+_PROPERTY_EXTRACTORS: dict[str, Callable[[dict], str | None]] = {
+    "title": _title_text,
+    "rich_text": _rich_text_text,
+    "url": _url_text,
+    "select": _select_text,
+    "multi_select": _multi_select_text,
+}
+
+
+def extract_content(page: dict, properties: list[str]) -> dict[str, str]:
     """ページから指定プロパティの内容を抽出"""
-    content = {}
+    content: dict[str, str] = {}
     props = page.get("properties", {})
 
     for prop_name in properties:
-        if prop_name not in props:
+        prop = props.get(prop_name)
+        if prop is None:
             continue
-
-        prop = props[prop_name]
-        prop_type = prop.get("type")
-
-        if prop_type == "title":
-            content[prop_name] = "".join(
-                t.get("plain_text", "") for t in prop.get("title", [])
-            )
-        elif prop_type == "rich_text":
-            content[prop_name] = "".join(
-                t.get("plain_text", "") for t in prop.get("rich_text", [])
-            )
-        elif prop_type == "url":
-            content[prop_name] = prop.get("url", "")
-        elif prop_type == "select":
-            select = prop.get("select")
-            if select:
-                content[prop_name] = select.get("name", "")
-        elif prop_type == "multi_select":
-            content[prop_name] = ", ".join(
-                s.get("name", "") for s in prop.get("multi_select", [])
-            )
+        extractor = _PROPERTY_EXTRACTORS.get(prop.get("type"))
+        if extractor is None:
+            continue
+        value = extractor(prop)
+        if value is not None:
+            content[prop_name] = value
 
     return content
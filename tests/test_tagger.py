@@ -1,16 +1,42 @@
 """tagger モジュールのユニットテスト"""
 
+import asyncio
+import contextlib
 import json
 import sys
 import os
+import re
+import tempfile
+import time
 import unittest
-from unittest.mock import MagicMock, patch
-
-# src をパスに追加
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
-from tagger import BaseTagger, GeminiTagger, ClaudeTagger, create_tagger, TAG_CATEGORIES, _to_pascal_case
-from utils import extract_block_text, extract_body_content
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# src をパスに追加（複数回読み込まれても重複させない）
+_SRC = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if _SRC not in sys.path:
+    sys.path.insert(0, _SRC)
+
+import main
+from config import Config
+from tagger import (
+    BaseTagger,
+    GeminiTagger,
+    ClaudeTagger,
+    RateLimitError,
+    create_tagger,
+    infer_tags_many,
+    TAG_CATEGORIES,
+    _json_dumps,
+    _json_loads,
+    _to_pascal_case,
+)
+from utils import extract_block_text, extract_body_content, extract_content
+from notion_service import NotionDB
+from rate_limiter import AsyncRateLimiter
+from main import _should_skip
 
 
 class ConcreteTagger(BaseTagger):
@@ -20,177 +46,264 @@ class ConcreteTagger(BaseTagger):
         return ["test"]
 
 
+@contextlib.contextmanager
+def swap_init(cls):
+    """cls.__init__ を何もしない関数に差し替える（SDKクライアントを生成させない）"""
+    original = cls.__init__
+    cls.__init__ = lambda self, *args, **kwargs: None
+    try:
+        yield
+    finally:
+        cls.__init__ = original
+
+
+def phrase_pattern(phrases) -> re.Pattern:
+    """phrases のいずれかに一致する正規表現（長いものを優先）。1回の走査で全フレーズを探す"""
+    return re.compile("|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)))
+
+
+# 既定プロンプトに必ず含まれるルール文
+_REQUIRED_PHRASES = (
+    "PascalCase",
+    "English",
+    "at least 1 tag is MANDATORY",
+    'Do NOT use generic tags like "Other"',
+)
+_REQUIRED_RE = phrase_pattern(_REQUIRED_PHRASES)
+
+# 既存タグ指定時に含まれる文
+_EXISTING_TAG_PHRASES = ("Python", "Docker", "Existing Tags", "MUST prefer these over creating new ones")
+_EXISTING_TAG_RE = phrase_pattern(_EXISTING_TAG_PHRASES)
+
+_CATEGORY_RE = phrase_pattern(TAG_CATEGORIES)
+
+
+def mk_block(block_type: str, text: str = "") -> dict:
+    """リッチテキスト1断片（text が空なら断片なし）のブロックを生成"""
+    return {"type": block_type, block_type: {"rich_text": [{"plain_text": text}] if text else []}}
+
+
 class TestBuildPrompt(unittest.TestCase):
     """_build_prompt のテスト"""
 
+    @classmethod
+    def setUpClass(cls):
+        # プロンプト生成は状態を変えないため、Taggerと既定プロンプトは1度だけ作る
+        cls.tagger = ConcreteTagger()
+        cls.tagger_with_tags = ConcreteTagger(available_tags=["Python", "Docker", "Testing"])
+        cls.default_prompt = cls.tagger._build_prompt({"Name": "test"})
+
     def test_prompt_contains_max_tags(self):
-        tagger = ConcreteTagger()
         content = {"Name": "テスト記事", "Content": "Pythonの基本"}
-        prompt = tagger._build_prompt(content, max_tags=3)
+        prompt = self.tagger._build_prompt(content, max_tags=3)
 
         self.assertIn("1 and 3 tags", prompt)
         self.assertIn("テスト記事", prompt)
         self.assertIn("Pythonの基本", prompt)
 
+    def test_prompt_contains_required_rules(self):
+        found = set(_REQUIRED_RE.findall(self.default_prompt))
+        self.assertEqual(set(_REQUIRED_PHRASES) - found, set())
+
     def test_prompt_contains_all_categories(self):
-        tagger = ConcreteTagger()
-        prompt = tagger._build_prompt({"Name": "test"})
+        found = set(_CATEGORY_RE.findall(self.default_prompt))
+        self.assertEqual(set(TAG_CATEGORIES) - found, set())
 
-        for category in TAG_CATEGORIES:
-            self.assertIn(category, prompt)
+    def test_prompt_with_existing_tags(self):
+        prompt = self.tagger_with_tags._build_prompt({"Name": "test"})
 
-    def test_prompt_contains_pascal_case_rule(self):
-        tagger = ConcreteTagger()
-        prompt = tagger._build_prompt({"Name": "test"})
+        found = set(_EXISTING_TAG_RE.findall(prompt))
+        self.assertEqual(set(_EXISTING_TAG_PHRASES) - found, set())
 
-        self.assertIn("PascalCase", prompt)
-        self.assertIn("English", prompt)
+    def test_batch_prompt_contains_all_items(self):
+        prompt = self.tagger._build_batch_prompt([{"Name": "記事A"}, {"Name": "記事B"}], max_tags=3)
 
-    def test_prompt_contains_mandatory_tag_rule(self):
-        tagger = ConcreteTagger()
-        prompt = tagger._build_prompt({"Name": "test"})
+        self.assertIn("1 and 3 tags", prompt)
+        self.assertIn("記事A", prompt)
+        self.assertIn("記事B", prompt)
+        self.assertIn('"results"', prompt)
+
+    def test_long_values_truncated(self):
+        tagger = ConcreteTagger(max_value_chars=10)
+        content = {"Name": "短い", "body": "A" * 50}
+        prompt = tagger._build_prompt(content)
+        batch_prompt = tagger._build_batch_prompt([content, {"Name": "B" * 11}])
+
+        self.assertIn('"body":"' + "A" * 10 + '…"', prompt)
+        self.assertNotIn("A" * 11, prompt)
+        self.assertIn("B" * 10 + "…", batch_prompt)
+        # 元のcontentは変更しない
+        self.assertEqual(content["body"], "A" * 50)
+
+    def test_configured_body_length_not_truncated(self):
+        config = SimpleNamespace(claude_api_key="test-key", body_max_chars=8000)
+        with patch("tagger._import_sdk", return_value=MagicMock()), patch("tagger.TAG_CACHE_PATH", None):
+            tagger = create_tagger("claude", config)
+        prompt = tagger._build_prompt({"body": "A" * 8000})
 
-        self.assertIn("at least 1 tag is MANDATORY", prompt)
+        self.assertIn("A" * 8000 + '"', prompt)
 
-    def test_prompt_with_existing_tags(self):
-        tagger = ConcreteTagger(available_tags=["Python", "Docker", "Testing"])
-        prompt = tagger._build_prompt({"Name": "test"})
+    def test_prompt_template_reused_per_max_tags(self):
+        tagger = self.tagger_with_tags
+        head, tail = tagger._prompt_template(5)
+        prompt = tagger._build_prompt({"Name": "記事"})
+
+        self.assertIs(tagger._prompt_template(5), tagger._prompt_template(5))
+        self.assertIsNot(tagger._prompt_template(3), tagger._prompt_template(5))
+        self.assertEqual(prompt, head + '{"Name":"記事"}' + tail)
+
+    def test_stdlib_fallback_matches_orjson_output(self):
+        content = {"Name": "記事", "body": "改行\nと\"引用符\""}
+        expected = _json_dumps(content)
+        with patch("tagger.orjson", None):
+            self.assertEqual(_json_dumps(content), expected)
+            self.assertEqual(_json_loads(expected), content)
 
-        self.assertIn("Python", prompt)
-        self.assertIn("Docker", prompt)
-        self.assertIn("Existing Tags", prompt)
-        self.assertIn("MUST prefer these over creating new ones", prompt)
+    def test_cache_key_independent_of_json_backend(self):
+        content = {"b": "記事", "a": ["x", 1]}
+        expected = BaseTagger._content_key(content, 5)
+        with patch("tagger.orjson", None):
+            self.assertEqual(BaseTagger._content_key(content, 5), expected)
 
-    def test_prompt_forbids_generic_other_tag(self):
+
+class TestParseBatchTags(unittest.TestCase):
+    """_parse_batch_tags のテスト"""
+
+    def test_results_ordered_by_id(self):
+        tagger = ConcreteTagger()
+        text = '{"results": [{"id": 1, "tags": ["docker"]}, {"id": 0, "tags": ["python"]}]}'
+        self.assertEqual(tagger._parse_batch_tags(text, 2), [["Python"], ["Docker"]])
+
+    def test_missing_id_returns_empty_list(self):
+        tagger = ConcreteTagger()
+        text = '```json\n{"results": [{"id": 0, "tags": ["Go"]}]}\n```'
+        self.assertEqual(tagger._parse_batch_tags(text, 2), [["Go"], []])
+
+    def test_string_ids_are_accepted(self):
         tagger = ConcreteTagger()
-        prompt = tagger._build_prompt({"Name": "test"})
+        text = '{"results": [{"id": "1", "tags": ["go"]}, {"id": "x", "tags": ["Rust"]}]}'
+        self.assertEqual(tagger._parse_batch_tags(text, 2), [[], ["Go"]])
 
-        self.assertIn('Do NOT use generic tags like "Other"', prompt)
+
+# (LLMレスポンス, 期待する tags)
+_EXTRACTED_JSON_CASES = (
+    ('{"tags": ["Python", "API"]}', ["Python", "API"]),
+    ('```json\n{"tags": ["Python", "API"]}\n```', ["Python", "API"]),
+    ('```\n{"tags": ["Go"]}\n```', ["Go"]),
+    ('Here are the tags:\n```json\n{"tags": ["Docker"]}\n```\nHope this helps.', ["Docker"]),
+    ('```json\n{"tags": ["Rust"]}', ["Rust"]),
+    ('```python\nx=1\n```\n```json\n{"tags": ["A"]}\n```', ["A"]),
+)
 
 
 class TestExtractJson(unittest.TestCase):
     """_extract_json のテスト"""
 
-    def test_extract_json_plain(self):
-        text = '{"tags": ["Python", "API"]}'
-        result = BaseTagger._extract_json(text)
-        self.assertEqual(result["tags"], ["Python", "API"])
-
-    def test_extract_json_with_code_block(self):
-        text = '```json\n{"tags": ["Python", "API"]}\n```'
-        result = BaseTagger._extract_json(text)
-        self.assertEqual(result["tags"], ["Python", "API"])
+    def test_extract_variants(self):
+        for text, expected in _EXTRACTED_JSON_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(BaseTagger._extract_json(text)["tags"], expected)
 
-    def test_extract_json_with_generic_code_block(self):
-        text = '```\n{"tags": ["Go"]}\n```'
+    def test_extract_json_nested_objects(self):
+        text = '```json\n{"results": [{"id": 0, "tags": ["Go"]}, {"id": 1, "tags": []}]}\n```'
         result = BaseTagger._extract_json(text)
-        self.assertEqual(result["tags"], ["Go"])
+        self.assertEqual(len(result["results"]), 2)
 
     def test_extract_json_invalid(self):
         with self.assertRaises(json.JSONDecodeError):
             BaseTagger._extract_json("not json at all")
 
 
-class TestToPascalCase(unittest.TestCase):
-    """_to_pascal_case のテスト"""
+# (入力, 期待値)
+_PASCAL_CASES = (
+    ("Python", "Python"),
+    ("GitHubActions", "GitHubActions"),
+    ("python", "Python"),
+    ("github_actions", "GithubActions"),
+    ("machine-learning", "MachineLearning"),
+    ("clean architecture", "CleanArchitecture"),
+    ("next.js", "NextJs"),
+    ("", ""),
+    ("  ", ""),
+)
 
-    def test_already_pascal_case(self):
-        self.assertEqual(_to_pascal_case("Python"), "Python")
-        self.assertEqual(_to_pascal_case("GitHubActions"), "GitHubActions")
 
-    def test_lowercase(self):
-        self.assertEqual(_to_pascal_case("python"), "Python")
-
-    def test_snake_case(self):
-        self.assertEqual(_to_pascal_case("github_actions"), "GithubActions")
-
-    def test_kebab_case(self):
-        self.assertEqual(_to_pascal_case("machine-learning"), "MachineLearning")
-
-    def test_space_separated(self):
-        self.assertEqual(_to_pascal_case("clean architecture"), "CleanArchitecture")
-
-    def test_dot_separated(self):
-        self.assertEqual(_to_pascal_case("next.js"), "NextJs")
-
-    def test_empty_string(self):
-        self.assertEqual(_to_pascal_case(""), "")
+class TestToPascalCase(unittest.TestCase):
+    """_to_pascal_case のテスト"""
 
-    def test_whitespace_only(self):
-        self.assertEqual(_to_pascal_case("  "), "")
+    def test_to_pascal_case(self):
+        for raw, expected in _PASCAL_CASES:
+            with self.subTest(raw=raw):
+                self.assertEqual(_to_pascal_case(raw), expected)
 
 
 class TestNormalizeTags(unittest.TestCase):
     """_normalize_tags のテスト"""
 
-    def test_basic_normalization(self):
-        tagger = ConcreteTagger()
-        result = tagger._normalize_tags(["python", "machine-learning"])
-        self.assertEqual(result, ["Python", "MachineLearning"])
+    @classmethod
+    def setUpClass(cls):
+        # _normalize_tags は既存タグのマップを読むだけなので、構成ごとに1つを共有する
+        cls.tagger = ConcreteTagger()
+        cls.tagger_pg_gha = ConcreteTagger(available_tags=["PostgreSql", "GitHubActions"])
+        cls.tagger_py_docker = ConcreteTagger(available_tags=["Python", "Docker"])
+
+    def test_normalize_tags(self):
+        cases = (
+            ("basic", self.tagger, ["python", "machine-learning"], ["Python", "MachineLearning"]),
+            ("deduplication", self.tagger, ["Python", "python", "PYTHON"], ["Python"]),
+            (
+                "existing_preference",
+                self.tagger_pg_gha,
+                ["postgresql", "githubactions"],
+                ["PostgreSql", "GitHubActions"],
+            ),
+            ("mixed", self.tagger_py_docker, ["python", "kubernetes"], ["Python", "Kubernetes"]),
+        )
+        for name, tagger, tags, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(tagger._normalize_tags(tags), expected)
+
+
+# create_tagger 用の設定（APIキーの有無だけを持つ）
+_CFG_OK = SimpleNamespace(gemini_api_key="test-key", claude_api_key="test-key", body_max_chars=4000)
+_CFG_MISSING = SimpleNamespace(gemini_api_key="", claude_api_key="", body_max_chars=4000)
 
-    def test_deduplication(self):
-        tagger = ConcreteTagger()
-        result = tagger._normalize_tags(["Python", "python", "PYTHON"])
-        self.assertEqual(result, ["Python"])
 
-    def test_existing_tag_preference(self):
-        tagger = ConcreteTagger(available_tags=["PostgreSql", "GitHubActions"])
-        result = tagger._normalize_tags(["postgresql", "githubactions"])
-        self.assertEqual(result, ["PostgreSql", "GitHubActions"])
-
-    def test_mixed_new_and_existing(self):
-        tagger = ConcreteTagger(available_tags=["Python", "Docker"])
-        result = tagger._normalize_tags(["python", "kubernetes"])
-        self.assertEqual(result, ["Python", "Kubernetes"])
+class TestCreateTagger(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # SDKクライアントを生成させないよう、クラス全体で __init__ を差し替える
+        cls._swaps = contextlib.ExitStack()
+        cls._swaps.enter_context(swap_init(GeminiTagger))
+        cls._swaps.enter_context(swap_init(ClaudeTagger))
 
+    @classmethod
+    def tearDownClass(cls):
+        cls._swaps.close()
 
-class TestCreateTagger(unittest.TestCase):
     def test_create_gemini_tagger(self):
-        config = MagicMock()
-        config.gemini_api_key = "test-key"
-
-        with patch("tagger.GeminiTagger.__init__", return_value=None):
-            tagger = create_tagger("gemini", config)
-            self.assertIsInstance(tagger, GeminiTagger)
+        self.assertIsInstance(create_tagger("gemini", _CFG_OK), GeminiTagger)
 
     def test_create_claude_tagger(self):
-        config = MagicMock()
-        config.claude_api_key = "test-key"
-
-        with patch("tagger.ClaudeTagger.__init__", return_value=None):
-            tagger = create_tagger("claude", config)
-            self.assertIsInstance(tagger, ClaudeTagger)
+        self.assertIsInstance(create_tagger("claude", _CFG_OK), ClaudeTagger)
 
     def test_create_tagger_missing_gemini_key(self):
-        config = MagicMock()
-        config.gemini_api_key = ""
-
         with self.assertRaises(ValueError):
-            create_tagger("gemini", config)
+            create_tagger("gemini", _CFG_MISSING)
 
     def test_create_tagger_missing_claude_key(self):
-        config = MagicMock()
-        config.claude_api_key = ""
-
         with self.assertRaises(ValueError):
-            create_tagger("claude", config)
+            create_tagger("claude", _CFG_MISSING)
 
     def test_create_tagger_with_available_tags(self):
-        config = MagicMock()
-        config.gemini_api_key = "test-key"
-        tags = ["Python", "Go"]
-
-        with patch("tagger.GeminiTagger.__init__", return_value=None):
-            tagger = create_tagger("gemini", config, available_tags=tags)
-            self.assertIsInstance(tagger, GeminiTagger)
+        tagger = create_tagger("gemini", _CFG_OK, available_tags=["Python", "Go"])
+        self.assertIsInstance(tagger, GeminiTagger)
 
 
 class TestExtractContent(unittest.TestCase):
     """utils.extract_content のテスト"""
 
     def test_extract_title_and_rich_text(self):
-        from utils import extract_content
-
         page = {
             "properties": {
                 "Name": {
@@ -208,15 +321,11 @@ class TestExtractContent(unittest.TestCase):
         self.assertEqual(result["Content"], "本文テキスト")
 
     def test_extract_missing_property(self):
-        from utils import extract_content
-
         page = {"properties": {}}
         result = extract_content(page, ["Name"])
         self.assertEqual(result, {})
 
     def test_extract_url_property(self):
-        from utils import extract_content
-
         page = {
             "properties": {
                 "URL": {"type": "url", "url": "https://example.com"},
@@ -226,8 +335,6 @@ class TestExtractContent(unittest.TestCase):
         self.assertEqual(result["URL"], "https://example.com")
 
     def test_extract_select_property(self):
-        from utils import extract_content
-
         page = {
             "properties": {
                 "Category": {
@@ -240,78 +347,31 @@ class TestExtractContent(unittest.TestCase):
         self.assertEqual(result["Category"], "技術")
 
 
-class TestExtractBlockText(unittest.TestCase):
-    """extract_block_text のテスト"""
-
-    def test_paragraph(self):
-        block = {
-            "type": "paragraph",
-            "paragraph": {"rich_text": [{"plain_text": "Hello World"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Hello World")
-
-    def test_heading_1(self):
-        block = {
-            "type": "heading_1",
-            "heading_1": {"rich_text": [{"plain_text": "Title"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Title")
-
-    def test_heading_2(self):
-        block = {
-            "type": "heading_2",
-            "heading_2": {"rich_text": [{"plain_text": "Subtitle"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Subtitle")
-
-    def test_heading_3(self):
-        block = {
-            "type": "heading_3",
-            "heading_3": {"rich_text": [{"plain_text": "Section"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Section")
-
-    def test_bulleted_list_item(self):
-        block = {
-            "type": "bulleted_list_item",
-            "bulleted_list_item": {"rich_text": [{"plain_text": "item 1"}]},
-        }
-        self.assertEqual(extract_block_text(block), "item 1")
-
-    def test_numbered_list_item(self):
-        block = {
-            "type": "numbered_list_item",
-            "numbered_list_item": {"rich_text": [{"plain_text": "step 1"}]},
-        }
-        self.assertEqual(extract_block_text(block), "step 1")
+# リッチテキストをそのまま結合するブロックタイプと期待値
+_BLOCK_CASES = (
+    ("paragraph", "Hello World"),
+    ("heading_1", "Title"),
+    ("heading_2", "Subtitle"),
+    ("heading_3", "Section"),
+    ("bulleted_list_item", "item 1"),
+    ("numbered_list_item", "step 1"),
+    ("quote", "a wise quote"),
+    ("callout", "Note: important"),
+    ("toggle", "Details"),
+    ("to_do", "Buy milk"),
+)
 
-    def test_quote(self):
-        block = {
-            "type": "quote",
-            "quote": {"rich_text": [{"plain_text": "a wise quote"}]},
-        }
-        self.assertEqual(extract_block_text(block), "a wise quote")
 
-    def test_callout(self):
-        block = {
-            "type": "callout",
-            "callout": {"rich_text": [{"plain_text": "Note: important"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Note: important")
+class TestExtractBlockText(unittest.TestCase):
+    """extract_block_text のテスト"""
 
-    def test_toggle(self):
-        block = {
-            "type": "toggle",
-            "toggle": {"rich_text": [{"plain_text": "Details"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Details")
+    def test_rich_text_block_types_in_one_document(self):
+        # 全ブロックタイプを並べた1つの本文で、ブロック単位と本文全体の両方を確認する
+        blocks = [mk_block(block_type, text) for block_type, text in _BLOCK_CASES]
+        texts = [text for _, text in _BLOCK_CASES]
 
-    def test_to_do(self):
-        block = {
-            "type": "to_do",
-            "to_do": {"rich_text": [{"plain_text": "Buy milk"}]},
-        }
-        self.assertEqual(extract_block_text(block), "Buy milk")
+        self.assertEqual([extract_block_text(block) for block in blocks], texts)
+        self.assertEqual(extract_body_content(blocks, max_chars=10_000), "\n".join(texts))
 
     def test_code_with_language(self):
         block = {
@@ -354,46 +414,44 @@ class TestExtractBlockText(unittest.TestCase):
         self.assertEqual(extract_block_text(block), "Hello World")
 
     def test_empty_rich_text(self):
-        block = {
-            "type": "paragraph",
-            "paragraph": {"rich_text": []},
-        }
-        self.assertEqual(extract_block_text(block), "")
+        self.assertEqual(extract_block_text(mk_block("paragraph")), "")
 
 
 class TestExtractBodyContent(unittest.TestCase):
     """extract_body_content のテスト"""
 
+    @classmethod
+    def setUpClass(cls):
+        # extract_body_content は入力を変更しないため、ブロック列はクラスで共有する
+        cls.blocks_truncation = [mk_block("paragraph", "A" * 50), mk_block("paragraph", "B" * 50)]
+        cls.blocks_boundary = [mk_block("paragraph", "A" * 10), mk_block("paragraph", "B" * 10)]
+        cls.blocks_single_long = [mk_block("paragraph", "X" * 100)]
+
     def test_basic_extraction(self):
         blocks = [
-            {"type": "heading_1", "heading_1": {"rich_text": [{"plain_text": "Title"}]}},
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "Body text"}]}},
+            mk_block("heading_1", "Title"),
+            mk_block("paragraph", "Body text"),
         ]
         result = extract_body_content(blocks)
         self.assertEqual(result, "Title\nBody text")
 
     def test_skip_unsupported_blocks(self):
         blocks = [
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "Before"}]}},
+            mk_block("paragraph", "Before"),
             {"type": "image", "image": {}},
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "After"}]}},
+            mk_block("paragraph", "After"),
         ]
         result = extract_body_content(blocks)
         self.assertEqual(result, "Before\nAfter")
 
     def test_truncation(self):
-        blocks = [
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "A" * 50}]}},
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "B" * 50}]}},
-        ]
-        result = extract_body_content(blocks, max_chars=60)
+        result = extract_body_content(self.blocks_truncation, max_chars=60)
         # 最初の50文字ブロック + 改行分(1) = 51, 残り9文字分で切り詰め
-        self.assertLessEqual(len(result), 60)
-        self.assertTrue(result.startswith("A" * 50))
+        self.assertEqual(result, "A" * 50 + "\n" + "B" * 9)
 
     def test_empty_blocks(self):
         blocks = [
-            {"type": "paragraph", "paragraph": {"rich_text": []}},
+            mk_block("paragraph"),
             {"type": "divider", "divider": {}},
         ]
         result = extract_body_content(blocks)
@@ -404,65 +462,582 @@ class TestExtractBodyContent(unittest.TestCase):
         self.assertEqual(result, "")
 
     def test_single_block_exceeds_max(self):
-        blocks = [
-            {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": "X" * 100}]}},
-        ]
-        result = extract_body_content(blocks, max_chars=30)
+        result = extract_body_content(self.blocks_single_long, max_chars=30)
         self.assertEqual(len(result), 30)
         self.assertEqual(result, "X" * 30)
 
+    def test_no_trailing_separator_at_limit(self):
+        # 改行を入れると残りが0文字になる場合は改行を付けずに打ち切る
+        self.assertEqual(extract_body_content(self.blocks_boundary, max_chars=11), "A" * 10)
+        self.assertEqual(extract_body_content(self.blocks_boundary, max_chars=12), "A" * 10 + "\nB")
 
-class TestShouldSkip(unittest.TestCase):
-    """_should_skip のテスト"""
+    def test_does_not_mutate_blocks(self):
+        extract_body_content(self.blocks_truncation, max_chars=60)
+        self.assertEqual(self.blocks_truncation, [mk_block("paragraph", "A" * 50), mk_block("paragraph", "B" * 50)])
 
-    def setUp(self):
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-        from main import _should_skip
 
-        self._should_skip = _should_skip
+# _should_skip 用の固定日時フィクスチャ（_should_skip は入力を変更しないので共有する）
+_SKIP_NOW = datetime(2026, 1, 31, 9, 0, tzinfo=timezone.utc)
+_SKIP_CUTOFF_24H = (_SKIP_NOW - timedelta(hours=24)).timestamp()
 
-    def _make_page(self, hours_ago):
-        """hours_ago 時間前にタグ付けされたページを生成"""
-        from datetime import datetime, timedelta, timezone
 
-        tagged_at = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
-        return {
-            "properties": {
-                "最終タグ付け日時": {
-                    "date": {"start": tagged_at.isoformat()},
-                },
-            },
-        }
+def _tagged_at_props(hours_ago: int) -> dict:
+    tagged_at = _SKIP_NOW - timedelta(hours=hours_ago)
+    return {"最終タグ付け日時": {"date": {"start": tagged_at.isoformat()}}}
+
+
+_TAGGED_AT_PROPS_1H = _tagged_at_props(1)
+_TAGGED_AT_PROPS_23H = _tagged_at_props(23)
+_TAGGED_AT_PROPS_24H = _tagged_at_props(24)
+_TAGGED_AT_PROPS_25H = _tagged_at_props(25)
+_TAGGED_AT_PROPS_EMPTY = {"最終タグ付け日時": {"date": None}}
+
+
+class TestShouldSkip(unittest.TestCase):
+    """_should_skip のテスト"""
 
     def test_skip_when_tagged_recently(self):
         """1時間前にタグ付け済み（24時間以内）→ スキップ"""
-        page = self._make_page(hours_ago=1)
-        self.assertTrue(self._should_skip(page, "最終タグ付け日時", 24))
+        page = {"properties": _TAGGED_AT_PROPS_1H}
+        self.assertTrue(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
 
     def test_no_skip_when_tagged_long_ago(self):
         """25時間前にタグ付け済み（24時間超）→ スキップしない"""
-        page = self._make_page(hours_ago=25)
-        self.assertFalse(self._should_skip(page, "最終タグ付け日時", 24))
+        page = {"properties": _TAGGED_AT_PROPS_25H}
+        self.assertFalse(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
 
     def test_no_skip_when_tagged_at_missing(self):
         """最終タグ付け日時が未設定 → スキップしない"""
-        page = {"properties": {"最終タグ付け日時": {"date": None}}}
-        self.assertFalse(self._should_skip(page, "最終タグ付け日時", 24))
+        page = {"properties": _TAGGED_AT_PROPS_EMPTY}
+        self.assertFalse(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
 
     def test_no_skip_when_property_absent(self):
         """最終タグ付け日時プロパティ自体がない → スキップしない"""
-        page = {"properties": {}}
-        self.assertFalse(self._should_skip(page, "最終タグ付け日時", 24))
+        self.assertFalse(_should_skip({"properties": {}}, "最終タグ付け日時", _SKIP_CUTOFF_24H))
 
     def test_no_skip_at_boundary(self):
         """ちょうど24時間前 → スキップしない"""
-        page = self._make_page(hours_ago=24)
-        self.assertFalse(self._should_skip(page, "最終タグ付け日時", 24))
+        page = {"properties": _TAGGED_AT_PROPS_24H}
+        self.assertFalse(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
 
     def test_skip_just_under_boundary(self):
         """23時間前（24時間以内）→ スキップ"""
-        page = self._make_page(hours_ago=23)
-        self.assertTrue(self._should_skip(page, "最終タグ付け日時", 24))
+        page = {"properties": _TAGGED_AT_PROPS_23H}
+        self.assertTrue(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
+
+    def test_naive_timestamp_treated_as_utc(self):
+        """タイムゾーンなしの日時はUTCとして扱う"""
+        naive = (_SKIP_NOW - timedelta(hours=1)).replace(tzinfo=None).isoformat()
+        page = {"properties": {"最終タグ付け日時": {"date": {"start": naive}}}}
+        self.assertTrue(_should_skip(page, "最終タグ付け日時", _SKIP_CUTOFF_24H))
+
+
+class FakeNotion:
+    """process_records テスト用の NotionDB 代替"""
+
+    def __init__(self, blocks=None):
+        self.blocks = blocks or {}
+        self.updated = {}
+
+    def iter_page_blocks(self, page_id):
+        yield from self.blocks.get(page_id, [])
+
+    def update_tags(self, page_id, tag_property, tags, tagged_at_property=None):
+        self.updated[page_id] = tags
+
+
+class RecordingTagger(BaseTagger):
+    """受け取ったcontentを記録するテスト用Tagger"""
+
+    def __init__(self, error=None, available_tags=None, cache_path=None):
+        super().__init__(available_tags, cache_path)
+        self.error = error
+        self.contents = []
+
+    def infer_tags(self, content: dict, max_tags: int = 5) -> list:
+        self.contents.append(content)
+        if self.error:
+            raise self.error
+        return ["Python"]
+
+
+class TestProcessRecords(unittest.TestCase):
+    """process_records のテスト"""
+
+    def setUp(self):
+        self.config = Config(content_properties=["Name"])
+        patchers = [
+            patch.object(main, "NOTION_REQUEST_INTERVAL", 0),
+            patch.dict(main.LLM_REQUEST_INTERVALS, {self.config.llm_provider: 0}),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _make_page(self, page_id, name):
+        return {
+            "id": page_id,
+            "properties": {
+                "Name": {"type": "title", "title": [{"plain_text": name}]},
+            },
+        }
+
+    def test_tags_all_records_with_body(self):
+        records = [self._make_page(f"page-{i}", f"記事{i}") for i in range(3)]
+        notion = FakeNotion(blocks={
+            "page-0": [mk_block("paragraph", "本文")],
+        })
+        tagger = RecordingTagger()
+
+        result = main.process_records(records, notion, tagger, self.config)
+
+        self.assertEqual(result, (3, 0, 0))
+        self.assertEqual(set(notion.updated), {"page-0", "page-1", "page-2"})
+        self.assertIn({"Name": "記事0", "body": "本文"}, tagger.contents)
+
+    def test_consume_record_iterator_in_batches(self):
+        records = (self._make_page(f"page-{i}", f"記事{i}") for i in range(25))
+        notion = FakeNotion()
+
+        result = main.process_records(records, notion, RecordingTagger(), self.config)
+
+        self.assertEqual(result, (25, 0, 0))
+        self.assertEqual(len(notion.updated), 25)
+
+    def test_batch_size_from_config(self):
+        records = [self._make_page(f"page-{i}", f"記事{i}") for i in range(7)]
+        notion = FakeNotion()
+        tagger = RecordingTagger()
+        batch_sizes = []
+        tagger.infer_tags_batch = lambda contents, max_tags=5: (
+            batch_sizes.append(len(contents)) or [["Go"]] * len(contents)
+        )
+        self.config.batch_size = 3
+
+        result = main.process_records(records, notion, tagger, self.config)
+
+        self.assertEqual(result, (7, 0, 0))
+        # 端数の1件はバッチにせず単体で推論する
+        self.assertEqual(batch_sizes, [3, 3])
+        self.assertEqual(len(tagger.contents), 1)
+
+    def test_skip_empty_content(self):
+        records = [self._make_page("page-0", "")]
+        notion = FakeNotion()
+
+        result = main.process_records(records, notion, RecordingTagger(), self.config)
+
+        self.assertEqual(result, (0, 0, 1))
+        self.assertEqual(notion.updated, {})
+
+    def test_fallback_to_single_request_for_missing_batch_result(self):
+        records = [self._make_page(f"page-{i}", f"記事{i}") for i in range(2)]
+        notion = FakeNotion()
+        tagger = RecordingTagger()
+        tagger.infer_tags_batch = lambda contents, max_tags=5: [["Docker"], []]
+
+        result = main.process_records(records, notion, tagger, self.config)
+
+        self.assertEqual(result, (2, 0, 0))
+        self.assertEqual(notion.updated, {"page-0": ["Docker"], "page-1": ["Python"]})
+
+    def test_count_failed_update(self):
+        records = [self._make_page(f"page-{i}", f"記事{i}") for i in range(2)]
+        notion = FakeNotion()
+        notion.update_tags = MagicMock(side_effect=[RuntimeError("502"), None])
+
+        result = main.process_records(records, notion, RecordingTagger(), self.config)
+
+        self.assertEqual(result, (1, 1, 0))
+        self.assertEqual(notion.update_tags.call_count, 2)
+
+    def test_abort_on_rate_limit(self):
+        records = [self._make_page(f"page-{i}", f"記事{i}") for i in range(3)]
+        notion = FakeNotion()
+        tagger = RecordingTagger(error=RateLimitError("429"))
+
+        with patch.object(main, "MAX_CONCURRENCY", 1):
+            result = main.process_records(records, notion, tagger, self.config)
+
+        self.assertEqual(result, (0, 3, 0))
+        self.assertEqual(len(tagger.contents), 1)
+        self.assertEqual(notion.updated, {})
+
+    def test_report_unread_records_after_abort(self):
+        records = iter([self._make_page(f"page-{i}", f"記事{i}") for i in range(200)])
+        tagger = RecordingTagger(error=RateLimitError("429"))
+
+        with self.assertLogs("main", "WARNING") as logs:
+            success, failed, skipped = main.process_records(
+                records, FakeNotion(), tagger, self.config
+            )
+
+        read = success + failed + skipped
+        self.assertLess(read, 200)
+        self.assertEqual(len(list(records)), 200 - read)
+        self.assertTrue(any(f"after reading {read} records" in line for line in logs.output))
+
+
+class TestAsyncRateLimiter(unittest.TestCase):
+    """AsyncRateLimiter のテスト"""
+
+    def _acquire_times(self, limiter, gap=0.0):
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await limiter.acquire()
+            first = loop.time() - start
+            await asyncio.sleep(gap)
+            await limiter.acquire()
+            return first, loop.time() - start
+
+        return asyncio.run(run())
+
+    def test_wait_for_interval(self):
+        first, second = self._acquire_times(AsyncRateLimiter(0.05))
+        self.assertLess(first, 0.05)
+        self.assertGreaterEqual(second, 0.05)
+
+    def test_no_wait_after_interval_elapsed(self):
+        first, second = self._acquire_times(AsyncRateLimiter(0.05), gap=0.06)
+        self.assertLess(second, 0.1)
+
+
+class TestTagCache(unittest.TestCase):
+    """tag / tag_batch の推論結果キャッシュのテスト"""
+
+    def test_reuse_result_for_same_content(self):
+        tagger = RecordingTagger()
+
+        self.assertEqual(tagger.tag({"Name": "記事"}), ["Python"])
+        self.assertEqual(tagger.tag({"Name": "記事"}), ["Python"])
+        self.assertEqual(len(tagger.contents), 1)
+
+    def test_batch_sends_only_uncached_unique_contents(self):
+        tagger = RecordingTagger()
+        tagger.tag({"Name": "A"})
+
+        result = tagger.tag_batch([{"Name": "A"}, {"Name": "B"}, {"Name": "B"}])
+
+        self.assertEqual(result, [["Python"], ["Python"], ["Python"]])
+        self.assertEqual(tagger.contents, [{"Name": "A"}, {"Name": "B"}])
+
+    def test_evict_oldest_entry(self):
+        tagger = RecordingTagger()
+        with patch("tagger.TAG_CACHE_MAX_SIZE", 2):
+            for name in ("A", "B", "C", "A"):
+                tagger.tag({"Name": name})
+        self.assertEqual(len(tagger.contents), 4)
+
+    def test_evict_least_recently_used_entry(self):
+        tagger = RecordingTagger()
+        with patch("tagger.TAG_CACHE_MAX_SIZE", 2):
+            for name in ("A", "B", "A", "C", "A", "B"):
+                tagger.tag({"Name": name})
+        # 参照し直した A は残り、B が追い出される
+        self.assertEqual([c["Name"] for c in tagger.contents], ["A", "B", "C", "B"])
+
+    def test_empty_result_not_cached(self):
+        tagger = RecordingTagger()
+        tagger.infer_tags = lambda content, max_tags=5: tagger.contents.append(content) or []
+        tagger.tag({"Name": "記事"})
+        tagger.tag({"Name": "記事"})
+        self.assertEqual(len(tagger.contents), 2)
+
+    def test_persist_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = Path(tmp_dir) / "tags.sqlite3"
+            first = RecordingTagger(cache_path=cache_path)
+            first.tag({"Name": "記事"})
+            second = RecordingTagger(cache_path=cache_path)
+
+            self.assertEqual(second.tag({"Name": "記事"}), ["Python"])
+            self.assertEqual(second.contents, [])
+
+    def test_persisted_result_scoped_by_model_and_existing_tags(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = Path(tmp_dir) / "tags.sqlite3"
+            first = RecordingTagger(cache_path=cache_path)
+            first.model_name = "model-a"
+            first.tag({"Name": "長めのタイトル" * 20})
+
+            other_model = RecordingTagger(cache_path=cache_path)
+            other_model.model_name = "model-b"
+            other_tags = RecordingTagger(available_tags=["Rust"], cache_path=cache_path)
+            other_tags.model_name = "model-a"
+            for tagger in (other_model, other_tags):
+                with self.subTest(scope=tagger._cache_scope):
+                    tagger.tag({"Name": "長めのタイトル" * 20})
+                    self.assertEqual(len(tagger.contents), 1)
+
+    def test_prune_expired_and_excess_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = Path(tmp_dir) / "tags.sqlite3"
+            tagger = RecordingTagger(cache_path=cache_path)
+            for name in ("A", "B", "C"):
+                tagger.tag({"Name": name})
+            tagger._tag_db.execute("UPDATE tag_results SET created_at = 0")
+            tagger.tag({"Name": "D"})
+            tagger.tag({"Name": "E"})
+
+            def count_rows():
+                db = RecordingTagger(cache_path=cache_path)._tag_db
+                return db.execute("SELECT COUNT(*) FROM tag_results").fetchone()[0]
+
+            # 期限切れの A〜C が削除される
+            self.assertEqual(count_rows(), 2)
+            with patch("tagger.TAG_CACHE_MAX_ROWS", 1):
+                self.assertEqual(count_rows(), 1)
+
+
+class TestInferTagsMany(unittest.TestCase):
+    """tag_async / infer_tags_many のテスト"""
+
+    def test_tag_async_uses_cache(self):
+        tagger = RecordingTagger()
+
+        async def run():
+            return [await tagger.tag_async({"Name": "記事"}) for _ in range(2)]
+
+        self.assertEqual(asyncio.run(run()), [["Python"], ["Python"]])
+        self.assertEqual(len(tagger.contents), 1)
+
+    def test_limiter_acquired_only_for_llm_calls(self):
+        tagger = RecordingTagger(available_tags=["Go", "Docker"])
+        limiter = SimpleNamespace(acquire=AsyncMock())
+        contents = [{"Name": "GoとDocker入門"}, {"Name": "記事"}, {"Name": "記事"}]
+
+        async def run():
+            for content in contents:
+                await tagger.tag_async(content, limiter=limiter)
+            await tagger.tag_batch_async(contents + [{"Name": "設計"}], limiter=limiter)
+
+        asyncio.run(run())
+        # 既存タグとの一致・キャッシュで決まった分は待機しない
+        self.assertEqual(limiter.acquire.call_count, 2)
+        self.assertEqual(tagger.contents, [{"Name": "記事"}, {"Name": "設計"}])
+
+    def test_results_in_input_order_with_bounded_concurrency(self):
+        class SlowTagger(RecordingTagger):
+            in_flight = 0
+            max_in_flight = 0
+
+            async def infer_tags_async(self, content, max_tags=5):
+                SlowTagger.in_flight += 1
+                SlowTagger.max_in_flight = max(SlowTagger.max_in_flight, SlowTagger.in_flight)
+                await asyncio.sleep(0.01)
+                SlowTagger.in_flight -= 1
+                return [content["Name"]]
+
+        contents = [{"Name": f"Tag{i}"} for i in range(6)]
+        result = asyncio.run(infer_tags_many(SlowTagger(), contents, max_concurrency=2))
+
+        self.assertEqual(result, [[f"Tag{i}"] for i in range(6)])
+        self.assertEqual(SlowTagger.max_in_flight, 2)
+
+    def test_claude_async_rate_limit(self):
+        class FakeRateLimitError(Exception):
+            pass
+
+        with patch("tagger._import_sdk", return_value=MagicMock()):
+            tagger = ClaudeTagger("test-key")
+
+        async def raise_429(**kwargs):
+            raise FakeRateLimitError("429 Too Many Requests")
+
+        tagger.async_client.messages.create = raise_429
+        with self.assertRaises(RateLimitError):
+            asyncio.run(tagger.infer_tags_async({"Name": "記事"}))
+
+
+class TestLocalTags(unittest.TestCase):
+    """短いcontentを既存タグとの一致でタグ付けするテスト"""
+
+    def _make_tagger(self):
+        return RecordingTagger(available_tags=["Docker", "Python", "Go", "Spring", "React", "GitHub"])
+
+    def test_short_content_uses_existing_tags(self):
+        tagger = self._make_tagger()
+
+        self.assertEqual(tagger.tag({"Name": "DockerでPython環境構築"}), ["Docker", "Python"])
+        self.assertEqual(tagger.contents, [])
+
+    def test_match_only_whole_words(self):
+        tagger = self._make_tagger()
+
+        self.assertEqual(tagger._match_local_tags({"Name": "Going to Django with Pythonic"}, 5), [])
+
+    def test_weak_matches_fall_back_to_llm(self):
+        tagger = self._make_tagger()
+        contents = (
+            # 大文字小文字が既存タグと異なる
+            {"Name": "How to go fast"},
+            {"Name": "Dockerでpython環境構築"},
+            # 一般的な英単語と区別できない1語だけの一致
+            {"Name": "Spring cleaning checklist"},
+            {"Name": "React to feedback"},
+            # URL中の文字列
+            {"Name": "Python tips", "URL": "https://GitHub.com/Docker/x"},
+        )
+        for content in contents:
+            with self.subTest(content=content):
+                self.assertEqual(tagger._match_local_tags(content, 5), [])
+
+    def test_long_content_falls_back_to_llm(self):
+        tagger = self._make_tagger()
+        content = {"Name": "Docker", "body": "x " * 100}
+
+        self.assertEqual(tagger.tag(content), ["Python"])
+        self.assertEqual(tagger.contents, [content])
+
+    def test_batch_sends_only_unmatched_contents(self):
+        tagger = self._make_tagger()
+
+        result = tagger.tag_batch([{"Name": "GoとDocker入門"}, {"Name": "設計メモ"}])
+
+        self.assertEqual(result, [["Go", "Docker"], ["Python"]])
+        self.assertEqual(tagger.contents, [{"Name": "設計メモ"}])
+
+
+class FakeDatabases:
+    """databases.retrieve の呼び出し回数を記録する"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def retrieve(self, database_id):
+        self.calls += 1
+        return {
+            "data_sources": [{"id": "ds-new"}],
+            "properties": {
+                "ラベル": {"type": "multi_select", "multi_select": {"options": [{"name": "Python"}]}},
+            },
+        }
+
+
+class TestNotionMetaCache(unittest.TestCase):
+    """NotionDB のメタ情報キャッシュのテスト"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_path = Path(tmp_dir.name) / "meta.json"
+        self.databases = FakeDatabases()
+
+    def _make_db(self):
+        db = NotionDB("test-key", "db-1", cache_path=self.cache_path)
+        db.client = MagicMock(databases=self.databases)
+        return db
+
+    def _write_cache(self, cached_at):
+        self.cache_path.write_text(json.dumps({
+            "db_id": "db-1",
+            "data_source_id": "ds-cached",
+            "tag_options": {"ラベル": ["Docker"]},
+            "cached_at": cached_at,
+        }))
+
+    def test_fetch_once_and_save_cache(self):
+        db = self._make_db()
+
+        self.assertEqual(db._get_data_source_id(), "ds-new")
+        self.assertEqual(db.get_existing_tags("ラベル"), ["Python"])
+        self.assertEqual(self.databases.calls, 1)
+        self.assertEqual(json.loads(self.cache_path.read_text())["data_source_id"], "ds-new")
+
+    def test_use_fresh_cache_without_request(self):
+        self._write_cache(time.time())
+        db = self._make_db()
+
+        self.assertEqual(db._get_data_source_id(), "ds-cached")
+        self.assertEqual(db.get_existing_tags("ラベル"), ["Docker"])
+        self.assertEqual(self.databases.calls, 0)
+
+    def test_serve_stale_cache_and_refresh(self):
+        self._write_cache(0)
+        db = self._make_db()
+
+        with patch("notion_service.threading.Thread") as thread_cls:
+            self.assertEqual(db._get_data_source_id(), "ds-cached")
+        thread_cls.assert_called_once_with(target=db._refresh_meta, daemon=True)
+
+        db._refresh_meta()
+        self.assertEqual(db._get_data_source_id(), "ds-new")
+
+    def test_existing_tags_wait_for_refresh_of_stale_cache(self):
+        self._write_cache(0)
+        db = self._make_db()
+
+        self.assertEqual(db.get_existing_tags("ラベル"), ["Python"])
+        self.assertEqual(self.databases.calls, 1)
+
+    def test_existing_tags_fall_back_to_stale_cache_on_refresh_error(self):
+        self._write_cache(0)
+        db = self._make_db()
+        db.client.databases = MagicMock()
+        db.client.databases.retrieve.side_effect = RuntimeError("502")
+
+        self.assertEqual(db.get_existing_tags("ラベル"), ["Docker"])
+
+
+class TestIterRecentlyUpdated(unittest.TestCase):
+    """iter_recently_updated のフィルタのテスト"""
+
+    def _query_filter(self, **kwargs):
+        db = NotionDB("test-key", "db-1", cache_path=None)
+        db._meta = {"data_source_id": "ds-1", "tag_options": {}}
+        db.client = MagicMock()
+        db.client.data_sources.query.return_value = {"results": [], "has_more": False}
+        list(db.iter_recently_updated(24, **kwargs))
+        return db.client.data_sources.query.call_args.kwargs["filter"]
+
+    def test_filter_last_edited_time_only(self):
+        query_filter = self._query_filter()
+        self.assertEqual(query_filter["timestamp"], "last_edited_time")
+
+    def test_filter_excludes_recently_tagged(self):
+        query_filter = self._query_filter(tagged_at_property="最終タグ付け日時")
+        last_edited, tagged_at = query_filter["and"]
+        self.assertEqual(last_edited["timestamp"], "last_edited_time")
+        self.assertEqual(
+            [cond["property"] for cond in tagged_at["or"]], ["最終タグ付け日時", "最終タグ付け日時"]
+        )
+        self.assertEqual(tagged_at["or"][0]["date"], {"is_empty": True})
+        self.assertEqual(
+            tagged_at["or"][1]["date"]["on_or_before"], last_edited["last_edited_time"]["after"]
+        )
+
+
+class TestIterPageBlocks(unittest.TestCase):
+    """iter_page_blocks のページネーションのテスト"""
+
+    def test_stop_fetching_when_body_is_full(self):
+        db = NotionDB("test-key", "db-1", cache_path=None)
+        db.client = MagicMock()
+        db.client.blocks.children.list.return_value = {
+            "results": [mk_block("paragraph", "A" * 50)],
+            "has_more": True,
+            "next_cursor": "cursor-2",
+        }
+
+        body = extract_body_content(db.iter_page_blocks("page-1"), max_chars=30)
+
+        self.assertEqual(body, "A" * 30)
+        db.client.blocks.children.list.assert_called_once_with(
+            block_id="page-1", page_size=100, start_cursor=None
+        )
+
+    def test_throttle_before_each_request(self):
+        db = NotionDB("test-key", "db-1", cache_path=None)
+        db.client = MagicMock()
+        db.client.blocks.children.list.side_effect = [
+            {"results": [mk_block("paragraph", "A")], "has_more": True, "next_cursor": "c2"},
+            {"results": [mk_block("paragraph", "B")], "has_more": False, "next_cursor": None},
+        ]
+        db.throttle = MagicMock()
+
+        self.assertEqual(len(list(db.iter_page_blocks("page-1"))), 2)
+        self.assertEqual(db.throttle.call_count, 2)
 
 
 if __name__ == "__main__":